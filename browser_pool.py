@@ -108,6 +108,8 @@ PUBLIC_IP_SERVICES = [
     "https://api.ipify.org",
     "https://icanhazip.com",
 ]
+PUBLIC_IP_CACHE_FILE = "public_ip.json"   # 上次成功获取的公网IP（位于 STATE_DIR，仅在所有服务都失败时兜底）
+PUBLIC_IP_TIMEOUT = 5                     # 单个IP服务的请求超时（秒）
 
 
 # ============================================================================
@@ -388,8 +390,9 @@ resource_monitor = ResourceMonitor()
 def get_public_ip() -> Optional[str]:
     """获取服务器公网IP
 
-    尝试多个服务，直到成功获取
-    获取后缓存，避免重复请求
+    进程内首次调用时总是实时请求IP服务（IP决定领取哪台服务器的任务和账号，不能用旧值），
+    成功后缓存在内存并写入 STATE_DIR/public_ip.json；
+    所有服务都失败时才回退到磁盘上记录的上次IP
 
     Returns:
         str: 公网IP地址
@@ -401,17 +404,33 @@ def get_public_ip() -> Optional[str]:
     if _server_ip:
         return _server_ip
 
+    ip = _lookup_public_ip()
+    if ip:
+        return ip
+
+    cached_ip = _load_public_ip_cache()
+    if cached_ip:
+        _server_ip = cached_ip
+        print(f"   ⚠️ 使用上次记录的服务器公网IP: {cached_ip}")
+    return cached_ip
+
+
+def _lookup_public_ip() -> Optional[str]:
+    """依次请求IP服务获取公网IP，成功后更新内存和磁盘缓存"""
+    global _server_ip
+
     print("🌐 正在获取服务器公网IP...")
 
     for service_url in PUBLIC_IP_SERVICES:
         try:
-            response = requests.get(service_url, timeout=10)
+            response = requests.get(service_url, timeout=PUBLIC_IP_TIMEOUT)
             if response.status_code == 200:
                 ip = response.text.strip()
                 # 简单验证IP格式
                 parts = ip.split('.')
                 if len(parts) == 4 and all(p.isdigit() and 0 <= int(p) <= 255 for p in parts):
                     _server_ip = ip
+                    _save_public_ip_cache(ip)
                     print(f"   ✅ 获取成功: {ip} (来源: {service_url})")
                     return ip
         except Exception as e:
@@ -422,6 +441,30 @@ def get_public_ip() -> Optional[str]:
     return None
 
 
+def _load_public_ip_cache() -> Optional[str]:
+    """读取上次成功获取的公网IP
+
+    Returns:
+        IP；没有记录或读取失败时为 None
+    """
+    try:
+        with open(os.path.join(STATE_DIR, PUBLIC_IP_CACHE_FILE), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get('ip') or None
+    except (OSError, ValueError, TypeError, AttributeError):
+        return None
+
+
+def _save_public_ip_cache(ip: str):
+    """写入公网IP磁盘缓存（失败不影响主流程）"""
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(os.path.join(STATE_DIR, PUBLIC_IP_CACHE_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'ip': ip, 'ts': time.time()}, f)
+    except OSError as e:
+        print(f"   ⚠️ 保存公网IP缓存失败: {e}")
+
+
 def get_cached_ip() -> Optional[str]:
     """获取缓存的公网IP"""
     return _server_ip
@@ -592,9 +635,13 @@ class CookieUploadQueue:
             self._upload_batch(batch)
 
     def _upload_batch(self, batch: List[Dict]):
-        """批量上传Cookie"""
+        """批量上传Cookie（同一批次内同一账号只上传最新的一份）"""
+        # 任务结束与保活可能在同一批次内多次提交同一账号，较早的Cookie已被覆盖，无需重复上传
+        latest_items = {}
         for item in batch:
-            account_id = item['account_id']
+            latest_items[item['account_id']] = item
+
+        for account_id, item in latest_items.items():
             cookies = item['cookies']
 
             try:
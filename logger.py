@@ -17,9 +17,11 @@
 
 import os
 import sys
+import time
+import queue
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler
-from datetime import datetime
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 from contextvars import ContextVar
 
 # ============================================================================
@@ -84,10 +86,18 @@ class _RawFormatter(logging.Formatter):
 
 _file_handler.setFormatter(_RawFormatter())
 
+# 文件写入经队列交给后台线程完成：调用方（含多线程采集中的 print）只负责入队，
+# 不再在每一行输出上争用文件 handler 的锁和磁盘 I/O。
+# 账号标签等内容在入队前已格式化完毕，不受后台线程上下文影响。
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_queue_listener = QueueListener(_log_queue, _file_handler)
+_queue_listener.start()
+atexit.register(_queue_listener.stop)  # 退出时排空队列，保证日志落盘
+
 # 创建 logger（仅文件输出，不加 console handler，避免与 stdout 重定向冲突）
 _file_logger = logging.getLogger("meituan_app_file")
 _file_logger.setLevel(logging.DEBUG)
-_file_logger.addHandler(_file_handler)
+_file_logger.addHandler(QueueHandler(_log_queue))
 _file_logger.propagate = False  # 不传播到 root logger
 
 
@@ -95,6 +105,23 @@ _file_logger.propagate = False  # 不传播到 root logger
 # 核心日志函数
 # ============================================================================
 
+# 同一秒内的日志复用已格式化的 "YYYY-MM-DD HH:MM:SS" 部分，只拼接毫秒
+# 以 (秒, 文本) 元组整体替换，多线程读写无需加锁
+_second_cache = (None, "")
+
+
+def _timestamp() -> str:
+    """返回 YYYY-MM-DD HH:MM:SS.mmm 格式的当前时间"""
+    global _second_cache
+    now = time.time()
+    second = int(now)
+    cached_second, text = _second_cache
+    if cached_second != second:
+        text = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        _second_cache = (second, text)
+    return f"{text}.{int((now - second) * 1000):03d}"
+
+
 def _log(module: str, account: str, message: str, level: str = "INFO"):
     """核心日志写入函数
 
@@ -108,7 +135,7 @@ def _log(module: str, account: str, message: str, level: str = "INFO"):
         message: 日志消息
         level: 日志级别 (INFO/WARN/ERROR)
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    timestamp = _timestamp()
     formatted = f"[{timestamp}] [{level}] [{module}] [{account}] {message}"
 
     # 写控制台（使用原始 stdout，绕过重定向）
@@ -220,11 +247,14 @@ class _StdoutRedirector:
                     pass
             else:
                 # 未格式化的 print 输出，包装为系统日志格式写入文件
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+                # 一次写入多行时逐行加前缀，保证每一行都能按日期/账号被查询到
+                timestamp = _timestamp()
                 account = get_current_account() or NO_ACCOUNT
-                formatted = f"[{timestamp}] [{self._level}] [{MODULE_SYSTEM}] [{account}] {stripped}"
+                prefix = f"[{timestamp}] [{self._level}] [{MODULE_SYSTEM}] [{account}] "
                 try:
-                    _file_logger.info(formatted)
+                    for line in stripped.splitlines():
+                        if line:
+                            _file_logger.info(prefix + line)
                 except Exception:
                     pass
 
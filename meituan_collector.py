@@ -8,22 +8,31 @@
 """
 
 import json
+import re
 import time
 import random
 import requests
 import requests.exceptions
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import math
 import os
 import sys
-import subprocess
+import shutil
 import signal
 import logging
-from typing import Dict, Any, Optional, List, Tuple
+import threading
+import atexit
+import contextvars
+from typing import Dict, Any, Optional, List, Tuple, Union, Mapping
+from types import MappingProxyType
 from pathlib import Path
 from datetime import datetime, timedelta
 from io import BytesIO
 from contextlib import contextmanager
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait as wait_futures
 
 # 统一日志模块导入
 from logger import log_collect, log_system, setup_stdout_redirect, set_current_account, clear_current_account
@@ -37,9 +46,23 @@ except ImportError:
     print("⚠️ 未安装pymysql，失败任务自动重试功能将不可用")
     print("   安装方法: pip install pymysql")
 
+# orjson导入 (可选，加速JSON序列化；未安装时回退到标准库json)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# python-calamine导入 (可选，Rust实现的xlsx解析引擎，比openpyxl快数倍；未安装时回退到pandas默认引擎)
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
 # Playwright导入 (用于store_stats任务)
 try:
-    from playwright.sync_api import sync_playwright
+    from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
     PLAYWRIGHT_AVAILABLE = True
 except ImportError:
     PLAYWRIGHT_AVAILABLE = False
@@ -98,6 +121,7 @@ DEV_MODE = True                     # 开发模式: True=24小时运行, False=
 WORK_START_HOUR = 8                 # 工作开始时间 (仅DEV_MODE=False时生效)
 WORK_END_HOUR = 23                  # 工作结束时间 (仅DEV_MODE=False时生效)
 NO_TASK_WAIT_SECONDS = 300          # 无任务时等待秒数 (5分钟)
+FETCH_TASK_BATCH = 4                # 每次向服务器领取的任务数（按优先级排序，本地逐个执行）
 
 # ============================================================================
 # ★★★ 浏览器池模式配置 ★★★
@@ -224,15 +248,80 @@ TEMPLATE_METRIC_LIST = ",".join([
 CONNECT_TIMEOUT = 10        # 连接建立超时（秒）
 API_TIMEOUT = 30            # 普通API请求超时（秒）
 DOWNLOAD_TIMEOUT = 120      # 文件下载超时（秒）
+TASK_REPORT_WAIT_TIMEOUT = 60  # 任务返回前等待后台状态上报完成的最长时间（秒）
+DOWNLOAD_BUFFER_SIZE = 1 << 20  # 文件下载写盘缓冲区（字节）：1MiB
 BROWSER_PAGE_TIMEOUT = 60000  # 浏览器页面加载超时（毫秒）
 LOGIN_CHECK_TIMEOUT = 30000   # 登录检测超时（毫秒）
 
+# 页面URL是否为登录页（被重定向到登录/通行证页面即视为Cookie失效）
+LOGIN_URL_RE = re.compile(r'login|passport', re.IGNORECASE)
+# Playwright 异常分类：超时 / 页面跳转导致执行上下文销毁（两者均可重试）
+TIMEOUT_ERROR_RE = re.compile(r'timeout', re.IGNORECASE)
+NAVIGATION_ERROR_RE = re.compile(r'execution context was destroyed|most likely because of a navigation', re.IGNORECASE)
+
+# store_stats 浏览器只用于建立页面上下文和发起接口请求，以下资源类型直接拦截，加快页面跳转
+STORE_STATS_BLOCKED_RESOURCE_TYPES = frozenset({
+    'image', 'stylesheet', 'font', 'media', 'texttrack', 'beacon', 'csp_report', 'imageset'
+})
+# 页面驱动执行器（传统模式）的页面仍需点击/判断元素可见性，只拦截图片/字体/媒体，保留样式
+PAGE_DRIVEN_BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'media', 'imageset'})
+
+# 共享 Chromium 的启动参数：关闭扩展、后台联网和后台标签页节流等与采集无关的功能
+CHROMIUM_LAUNCH_ARGS = (
+    '--disable-gpu',
+    '--disable-dev-shm-usage',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--no-first-run',
+    '--no-default-browser-check',
+)
+
 # 指数退避重试配置
 MAX_RETRY_ATTEMPTS = 3      # 最大重试次数
 INITIAL_RETRY_DELAY = 2     # 初始重试延迟（秒）
 MAX_RETRY_DELAY = 60        # 最大重试延迟（秒）
 RETRY_BACKOFF_FACTOR = 2    # 退避因子
 
+# 数据上传连接池配置
+UPLOAD_POOL_CONNECTIONS = 4   # 连接池数量（按主机）
+UPLOAD_POOL_MAXSIZE = 32      # 每个连接池最大连接数
+UPLOAD_MAX_WORKERS = 8        # 逐行上传的并发线程数（不超过 UPLOAD_POOL_MAXSIZE）
+
+# 任务调度API连接池配置（create/fetch/callback/reset/reschedule 共用）
+TASK_API_POOL_CONNECTIONS = 4
+TASK_API_POOL_MAXSIZE = 8
+TASK_API_MAX_ATTEMPTS = 4             # 调度API最大尝试次数（网络异常/5xx时指数退避重试）
+TASK_API_RETRY_INITIAL_DELAY = 0.5    # 调度API首次重试延迟（秒），之后 1s、2s ...
+
+# 门店商圈数据获取配置
+REGION_FETCH_MAX_WORKERS = 4      # 并发线程数
+REGION_FETCH_MIN_INTERVAL = 0.5   # 相邻两次请求的最小间隔（秒），避免请求过快
+
+# 同行排名逐门店请求的并发线程数（每个线程内仍保留反爬虫等待）
+RIVAL_RANK_MAX_WORKERS = 4
+
+# 同一页面内纯HTTP任务（不操作浏览器页面）的并发线程数，如报表页的两个报表任务
+PAGE_TASK_MAX_WORKERS = 4
+
+# 点评数据接口限速（令牌桶，按实例内所有线程共享）
+DIANPING_REQUEST_RATE = 2.0     # 平均每秒请求数
+DIANPING_REQUEST_BURST = 5      # 允许的突发请求数
+DIANPING_REQUEST_JITTER = 0.3   # 每次请求附加的随机抖动上限（秒）
+
+# 报表Excel下载缓存有效期（秒），同一报表在重试/重跑时直接读取本地文件，不再重复下载
+REPORT_CACHE_TTL = 3600
+
+# 账户信息API结果内存缓存有效期（秒），同一账户短时间内的重复调用（如加载账户信息后紧接着执行任务）只请求一次
+ACCOUNT_API_CACHE_TTL = 30
+
+# 守护进程中平台账户配置（templates_id/auth_status，不含Cookie和签名）的内存缓存有效期（秒）
+PLATFORM_ACCOUNT_CACHE_TTL = 900
+
+# 财务余额内存缓存有效期（秒），同一进程内短时间重复执行同一账户时不再重复请求
+FINANCE_BALANCE_CACHE_TTL = 300
+
 # ============================================================================
 # ★★★ 日志配置 ★★★
 # ============================================================================
@@ -284,6 +373,13 @@ PAGE_TASKS = {
 # 页面执行顺序（客流分析先执行以更新签名，评价页面放最后）
 PAGE_ORDER = ["flow_analysis", "report", "review"]
 
+# 页面名称（用于日志显示）
+PAGE_NAMES = {
+    "report": "报表页面",
+    "flow_analysis": "客流分析页面",
+    "review": "评价页面",
+}
+
 # ============================================================================
 # ★★★ 任务独立页面URL配置 ★★★
 # ============================================================================
@@ -342,6 +438,26 @@ TASK_DISABLED_FLAGS = {
     "review_summary_meituan": True,    # ⚠️ 已禁用
 }
 
+# 各页面已启用/已禁用的任务（配置为静态，导入时计算一次，执行时直接查表）
+_PAGE_ENABLED_TASKS = {
+    page_key: tuple(t for t in tasks if not TASK_DISABLED_FLAGS.get(t, False))
+    for page_key, tasks in PAGE_TASKS.items()
+}
+_PAGE_DISABLED_TASKS = {
+    page_key: tuple(t for t in tasks if TASK_DISABLED_FLAGS.get(t, False))
+    for page_key, tasks in PAGE_TASKS.items()
+}
+# 从某页面开始（含）到最后的全部任务名称，登录失效中止时据此一次性生成失败结果
+_REMAINING_PAGE_TASKS = {
+    page_key: tuple(t for p in PAGE_ORDER[i:] for t in PAGE_TASKS.get(p, ()))
+    for i, page_key in enumerate(PAGE_ORDER)
+}
+# 各页面的 (URL, 页面名称, 日志中显示的URL前缀)
+_PAGE_META = {
+    page_key: (page_url, PAGE_NAMES.get(page_key, page_key), page_url[:80])
+    for page_key, page_url in PAGE_URLS.items()
+}
+
 # 任务执行顺序（all模式下的执行顺序）
 TASK_EXECUTION_ORDER = [
     "store_stats",
@@ -353,6 +469,20 @@ TASK_EXECUTION_ORDER = [
     "review_summary_meituan",
 ]
 
+# 任务优先级（随任务调度生成请求下发，服务端按优先级从高到低派发任务）
+TASK_PRIORITY_CRITICAL = 2   # store_stats 会刷新后续任务使用的签名，最先执行
+TASK_PRIORITY_NORMAL = 1
+TASK_PRIORITY_LOWEST = 0
+TASK_TYPE_PRIORITY = {
+    "store_stats": TASK_PRIORITY_CRITICAL,
+    "kewen_daily_report": TASK_PRIORITY_NORMAL,
+    "promotion_daily_report": TASK_PRIORITY_NORMAL,
+    "review_detail_dianping": TASK_PRIORITY_NORMAL,
+    "review_detail_meituan": TASK_PRIORITY_NORMAL,
+    "review_summary_dianping": TASK_PRIORITY_LOWEST,
+    "review_summary_meituan": TASK_PRIORITY_LOWEST,
+}
+
 # ============================================================================
 # 共享签名存储 (store_stats执行后更新，供其他任务使用)
 # ============================================================================
@@ -371,12 +501,15 @@ SHARED_SIGNATURE = {
 # ============================================================================
 # 全局运行标志 (用于优雅退出)
 _daemon_running = True
+# 退出事件：收到信号时置位，立即唤醒 interruptible_sleep 中的等待
+_shutdown_event = threading.Event()
 
 
 def _signal_handler(signum, frame):
     """信号处理函数，用于优雅退出"""
     global _daemon_running
     _daemon_running = False
+    _shutdown_event.set()
     sig_name = signal.Signals(signum).name if hasattr(signal, 'Signals') else str(signum)
     print(f"\n{'=' * 60}")
     print(f"⚠️ 收到退出信号 ({sig_name})，等待当前任务完成后退出...")
@@ -429,22 +562,18 @@ def ensure_directories():
             raise
 
 
-def interruptible_sleep(seconds: int, check_interval: int = 10) -> bool:
+def interruptible_sleep(seconds: float) -> bool:
     """可中断的睡眠函数
 
+    在退出事件上等待，收到退出信号时立即返回，不再按固定间隔轮询运行标志。
+
     Args:
-        seconds: 总睡眠秒数
-        check_interval: 检查间隔秒数
+        seconds: 总睡眠秒数（可为小数）
 
     Returns:
         bool: True=正常完成, False=被中断
     """
-    global _daemon_running
-    elapsed = 0
-    while elapsed < seconds and _daemon_running:
-        sleep_time = min(check_interval, seconds - elapsed)
-        time.sleep(sleep_time)
-        elapsed += sleep_time
+    _shutdown_event.wait(seconds)
     return _daemon_running
 
 
@@ -462,7 +591,6 @@ def log_task_result(
     error_message: str = "无"
 ) -> bool:
     """上报任务执行日志到API"""
-    headers = {'Content-Type': 'application/json'}
     json_param = {
         "account_id": account_id,
         "shop_id": shop_id,
@@ -473,7 +601,6 @@ def log_task_result(
         "record_count": record_count,
         "error_message": error_message
     }
-    proxies = {'http': None, 'https': None}
 
     print(f"\n{'─' * 50}")
     print(f"📝 日志上报请求:")
@@ -481,7 +608,7 @@ def log_task_result(
     print(f"   请求参数: {json.dumps(json_param, ensure_ascii=False, indent=6)}")
 
     try:
-        response = requests.post(LOG_API_URL, headers=headers, data=json.dumps(json_param), proxies=proxies, timeout=30)
+        response = TASK_API_SESSION.post(LOG_API_URL, json=json_param, timeout=API_TIMEOUT)
         print(f"   HTTP状态码: {response.status_code}")
         print(f"   响应内容: {response.text[:500] if response.text else '(空)'}")
         if response.status_code == 200:
@@ -523,6 +650,65 @@ def get_session() -> requests.Session:
     return session
 
 
+def json_dumps_bytes(obj: Any) -> bytes:
+    """序列化为UTF-8编码的JSON字节串（不转义中文），优先使用orjson"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """解析JSON（bytes或str），优先使用orjson"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_excel_bytes(content: Union[bytes, BytesIO], **kwargs) -> pd.DataFrame:
+    """从内存中的xlsx内容（bytes 或 BytesIO）读取DataFrame，优先使用calamine引擎"""
+    if CALAMINE_AVAILABLE:
+        kwargs.setdefault('engine', 'calamine')
+    source = BytesIO(content) if isinstance(content, bytes) else content
+    return pd.read_excel(source, **kwargs)
+
+
+def id_column_to_str(series: pd.Series) -> pd.Series:
+    """将Excel中的数字ID列转为字符串（如 123.0 -> '123'），空值/无法解析的值为 NaN"""
+    return pd.to_numeric(series, errors='coerce').map(lambda v: str(int(v)), na_action='ignore')
+
+
+def _create_upload_session() -> requests.Session:
+    """创建数据上传用的Session（keep-alive连接池 + 连接级重试）"""
+    session = get_session()
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=UPLOAD_POOL_CONNECTIONS, pool_maxsize=UPLOAD_POOL_MAXSIZE,
+                          max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# 上传API共享Session，逐行上传时复用TCP连接
+UPLOAD_SESSION = _create_upload_session()
+
+
+def _create_task_api_session() -> requests.Session:
+    """创建任务调度API用的Session（keep-alive连接池，默认JSON请求头）
+
+    重试不在连接层做，由 _post_task_api 统一按指数退避处理。
+    """
+    session = get_session()
+    session.headers.update({'Content-Type': 'application/json'})
+    adapter = HTTPAdapter(pool_connections=TASK_API_POOL_CONNECTIONS, pool_maxsize=TASK_API_POOL_MAXSIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# 任务调度API共享Session（同时用于任务日志、任务状态、账户状态等上报），守护进程每个任务的多次请求复用同一TCP连接
+TASK_API_SESSION = _create_task_api_session()
+
+
 @contextmanager
 def managed_session():
     """Session上下文管理器，确保Session正确关闭"""
@@ -621,13 +807,15 @@ def is_retryable_status_code(status_code: int) -> bool:
 
 
 def retry_request(request_func, max_attempts: int = MAX_RETRY_ATTEMPTS,
-                  description: str = "请求") -> requests.Response:
+                  description: str = "请求",
+                  initial_delay: float = INITIAL_RETRY_DELAY) -> requests.Response:
     """带指数退避的请求重试包装器
 
     Args:
         request_func: 执行请求的函数，无参数
         max_attempts: 最大尝试次数
         description: 请求描述，用于日志
+        initial_delay: 首次重试延迟秒数
 
     Returns:
         响应对象
@@ -644,7 +832,7 @@ def retry_request(request_func, max_attempts: int = MAX_RETRY_ATTEMPTS,
             # 检查HTTP状态码是否需要重试
             if is_retryable_status_code(response.status_code):
                 if attempt < max_attempts:
-                    delay = calculate_retry_delay(attempt)
+                    delay = calculate_retry_delay(attempt, initial_delay)
                     logger.warning(f"{description} 返回 {response.status_code}，第 {attempt}/{max_attempts} 次尝试，"
                                    f"{delay:.1f} 秒后重试...")
                     time.sleep(delay)
@@ -661,7 +849,7 @@ def retry_request(request_func, max_attempts: int = MAX_RETRY_ATTEMPTS,
                 raise
 
             if attempt < max_attempts:
-                delay = calculate_retry_delay(attempt)
+                delay = calculate_retry_delay(attempt, initial_delay)
                 logger.warning(f"{description} 失败: {e}，第 {attempt}/{max_attempts} 次尝试，"
                                f"{delay:.1f} 秒后重试...")
                 time.sleep(delay)
@@ -718,11 +906,11 @@ def delete_file_safely(file_path: str) -> bool:
         是否删除成功
     """
     try:
-        path = Path(file_path)
-        if path.exists():
-            path.unlink()
-            logger.debug(f"已删除临时文件: {file_path}")
-            return True
+        Path(file_path).unlink()
+        logger.debug(f"已删除临时文件: {file_path}")
+        return True
+    except FileNotFoundError:
+        pass
     except Exception as e:
         logger.warning(f"删除文件失败 {file_path}: {e}")
     return False
@@ -771,21 +959,18 @@ def report_auth_invalid(account_name: str) -> bool:
     print(f"\n{'─' * 50}")
     print(f"🔔 上报账户登录失效状态...")
 
-    headers = {'Content-Type': 'application/json'}
+    # 已确认失效的Cookie不能再从缓存返回
+    with _account_api_cache_lock:
+        _account_api_cache.pop(account_name, None)
+    invalidate_platform_config_cache(account_name)
+
     json_param = {
         "account": account_name,
         "auth_status": "invalid"
     }
-    proxies = {'http': None, 'https': None}
 
     try:
-        response = requests.post(
-            AUTH_STATUS_API_URL,
-            headers=headers,
-            data=json.dumps(json_param),
-            proxies=proxies,
-            timeout=30
-        )
+        response = TASK_API_SESSION.post(AUTH_STATUS_API_URL, json=json_param, timeout=API_TIMEOUT)
         print(f"   URL: {AUTH_STATUS_API_URL}")
         print(f"   请求参数: {json.dumps(json_param, ensure_ascii=False)}")
         print(f"   HTTP状态码: {response.status_code}")
@@ -969,20 +1154,11 @@ def upload_task_status_batch(account_id: str, start_date: str, end_date: str, re
         json_param[f"{task_name}_records"] = record_count
         json_param[f"{task_name}_error"] = error
 
-    headers = {'Content-Type': 'application/json'}
-    proxies = {'http': None, 'https': None}
-
     print(f"   URL: {TASK_STATUS_BATCH_API_URL}")
     print(f"   请求参数: {json.dumps(json_param, ensure_ascii=False, indent=6)}")
 
     try:
-        response = requests.post(
-            TASK_STATUS_BATCH_API_URL,
-            headers=headers,
-            data=json.dumps(json_param),
-            proxies=proxies,
-            timeout=30
-        )
+        response = TASK_API_SESSION.post(TASK_STATUS_BATCH_API_URL, data=json_dumps_bytes(json_param), timeout=API_TIMEOUT)
         print(f"   HTTP状态码: {response.status_code}")
         print(f"   响应内容: {response.text[:500] if response.text else '(空)'}")
 
@@ -1032,20 +1208,11 @@ def upload_task_status_single(account_id: str, start_date: str, end_date: str, r
         "error_message": error
     }
 
-    headers = {'Content-Type': 'application/json'}
-    proxies = {'http': None, 'https': None}
-
     print(f"   URL: {TASK_STATUS_SINGLE_API_URL}")
     print(f"   请求参数: {json.dumps(json_param, ensure_ascii=False, indent=6)}")
 
     try:
-        response = requests.post(
-            TASK_STATUS_SINGLE_API_URL,
-            headers=headers,
-            data=json.dumps(json_param),
-            proxies=proxies,
-            timeout=30
-        )
+        response = TASK_API_SESSION.post(TASK_STATUS_SINGLE_API_URL, data=json_dumps_bytes(json_param), timeout=API_TIMEOUT)
         print(f"   HTTP状态码: {response.status_code}")
         print(f"   响应内容: {response.text[:500] if response.text else '(空)'}")
 
@@ -1847,11 +2014,36 @@ def navigate_to_url(page, url: str, page_name: str, max_retries: int = 3) -> boo
     return False
 
 
-def load_cookies_from_api(account_name: str) -> Dict[str, Any]:
+# 账户信息API结果缓存（进程内共享）: account_name -> (获取时间, 账户信息)
+_account_api_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_account_api_cache_lock = threading.Lock()
+
+
+def load_cookies_from_api(account_name: str, force_refresh: bool = False) -> Dict[str, Any]:
     """从API加载cookies和相关信息
 
-    使用 /api/get_platform_account 获取账户信息
+    使用 /api/get_platform_account 获取账户信息；ACCOUNT_API_CACHE_TTL 内的重复调用直接返回缓存
+
+    Args:
+        account_name: 账户名称
+        force_refresh: 是否跳过缓存强制重新请求（如Cookie失效后重新登录）
     """
+    if not force_refresh:
+        with _account_api_cache_lock:
+            cached = _account_api_cache.get(account_name)
+        if cached and time.time() - cached[0] < ACCOUNT_API_CACHE_TTL:
+            print(f"📌 使用账户 [{account_name}] 的缓存信息（{ACCOUNT_API_CACHE_TTL}秒内有效）")
+            # 返回副本，避免调用方修改 cookies 影响缓存
+            return {**cached[1], 'cookies': dict(cached[1]['cookies'])}
+
+    account_info = _fetch_account_info_from_api(account_name)
+    with _account_api_cache_lock:
+        _account_api_cache[account_name] = (time.time(), account_info)
+    return {**account_info, 'cookies': dict(account_info['cookies'])}
+
+
+def _fetch_account_info_from_api(account_name: str) -> Dict[str, Any]:
+    """请求 /api/get_platform_account 并解析账户信息（不使用缓存）"""
     print(f"🔍 正在从API获取账户 [{account_name}] 的cookie...")
 
     session = get_session()
@@ -1970,21 +2162,13 @@ def get_platform_account(account: str) -> Dict[str, Any]:
     print(f"\n{'─' * 50}")
     print(f"🔍 获取平台账户信息: {account}")
 
-    headers = {'Content-Type': 'application/json'}
     json_param = {"account": account}
-    proxies = {'http': None, 'https': None}
 
     print(f"   URL: {GET_PLATFORM_ACCOUNT_API_URL}")
     print(f"   请求参数: {json.dumps(json_param, ensure_ascii=False)}")
 
     try:
-        response = requests.post(
-            GET_PLATFORM_ACCOUNT_API_URL,
-            headers=headers,
-            data=json.dumps(json_param),
-            proxies=proxies,
-            timeout=30
-        )
+        response = TASK_API_SESSION.post(GET_PLATFORM_ACCOUNT_API_URL, json=json_param, timeout=API_TIMEOUT)
         print(f"   HTTP状态码: {response.status_code}")
 
         if response.status_code == 200:
@@ -2032,6 +2216,54 @@ def get_platform_account(account: str) -> Dict[str, Any]:
         }
 
 
+# 平台账户配置缓存（守护进程生命周期内共享）: account -> (获取时间, {'auth_status', 'templates_id'})
+# 只缓存配置字段；cookie/mtgsig 会随重新登录、Cookie刷新而变化，使用时总是实时获取
+_platform_config_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_platform_config_cache_lock = threading.Lock()
+
+
+def remember_platform_config(account: str, platform_account: Dict[str, Any]) -> Dict[str, Any]:
+    """记录 get_platform_account 结果中的配置字段，返回合并后的配置
+
+    接口返回的 templates_id 为空时沿用缓存中自动获取/创建过的 templates_id；
+    获取失败或 auth_status=invalid 时不缓存，账户重新登录后能立即恢复执行。
+
+    Args:
+        account: 账户名称（手机号）
+        platform_account: get_platform_account 的返回结果
+
+    Returns:
+        dict: {'auth_status': ..., 'templates_id': ...}
+    """
+    with _platform_config_cache_lock:
+        cached = _platform_config_cache.get(account)
+        if cached and time.monotonic() - cached[0] >= PLATFORM_ACCOUNT_CACHE_TTL:
+            cached = None
+        config = {
+            'auth_status': platform_account.get('auth_status'),
+            'templates_id': platform_account.get('templates_id') or (cached[1]['templates_id'] if cached else None),
+        }
+        if platform_account.get('success') and config['auth_status'] != 'invalid':
+            _platform_config_cache[account] = (time.monotonic(), config)
+        else:
+            _platform_config_cache.pop(account, None)
+    return dict(config)
+
+
+def remember_platform_templates_id(account: str, templates_id: int):
+    """把自动获取/创建到的 templates_id 记入缓存，后续任务不再重复打开浏览器获取"""
+    with _platform_config_cache_lock:
+        cached = _platform_config_cache.get(account)
+        if cached:
+            _platform_config_cache[account] = (cached[0], {**cached[1], 'templates_id': templates_id})
+
+
+def invalidate_platform_config_cache(account: str):
+    """删除账户的平台配置缓存（登录失效时调用）"""
+    with _platform_config_cache_lock:
+        _platform_config_cache.pop(account, None)
+
+
 def generate_mtgsig(cookies: dict, mtgsig_from_api: str = None) -> str:
     """生成mtgsig签名参数
 
@@ -2518,7 +2750,7 @@ def ensure_template_id_with_browser(account_name: str, cookies: dict,
 
     支持两种模式：
     1. 浏览器池模式：传入 browser_pool，复用池中的 Context（避免 Playwright 实例冲突）
-    2. 单任务模式：不传 browser_pool，创建独立的 Playwright 实例
+    2. 单任务模式：不传 browser_pool，复用当前线程共享的浏览器（get_store_stats_browser）
 
     流程：
     1. 获取/创建浏览器页面
@@ -2652,34 +2884,20 @@ def ensure_template_id_with_browser(account_name: str, cookies: dict,
             traceback.print_exc()
             return None
 
-    # 单任务模式（创建独立 Playwright 实例）
+    # 单任务模式（复用当前线程共享的浏览器，只新建独立 Context）
     print("   使用单任务模式")
-    playwright = None
-    browser = None
     context = None
 
     try:
-        playwright = sync_playwright().start()
-        browser = playwright.chromium.launch(headless=headless, proxy=None)
+        browser = get_store_stats_browser(headless=headless)
 
         # 转换cookies为Playwright格式
-        playwright_cookies = []
-        for name, value in cookies.items():
-            playwright_cookies.append({
-                'name': name,
-                'value': str(value),
-                'domain': '.dianping.com',
-                'path': '/'
-            })
+        playwright_cookies = [
+            {'name': name, 'value': str(value), 'domain': '.dianping.com', 'path': '/'}
+            for name, value in cookies.items()
+        ]
 
-        context = browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            proxy=None,
-            bypass_csp=True,
-            ignore_https_errors=True
-        )
-        context.add_cookies(playwright_cookies)
+        context = new_store_stats_context(browser, cookies=playwright_cookies)
         page = context.new_page()
 
         # ========== 先检查登录状态 ==========
@@ -2737,17 +2955,13 @@ def ensure_template_id_with_browser(account_name: str, cookies: dict,
         return None
 
     finally:
-        # 关闭浏览器
+        # 只关闭本次的 Context，共享浏览器留给后续任务复用
         try:
             if context:
                 context.close()
-            if browser:
-                browser.close()
-            if playwright:
-                playwright.stop()
-            print("✓ 浏览器已关闭")
+            print("✓ 浏览器Context已关闭")
         except Exception as e:
-            print(f"⚠️ 关闭浏览器时出错: {e}")
+            print(f"⚠️ 关闭浏览器Context时出错: {e}")
 
 
 # ============================================================================
@@ -3430,8 +3644,7 @@ def run_promotion_daily_report(account_name: str, start_date: str, end_date: str
                 }
                 print(f"\n   [{idx+1}/{len(df)}] 上传数据:")
                 print(f"      shop_id={json_param['shop_id']}, report_date={json_param['report_date']}, shop_name={json_param['shop_name']}")
-                resp = requests.post(UPLOAD_APIS[table_name], headers={'Content-Type': 'application/json'},
-                                     data=json.dumps(json_param), proxies={'http': None, 'https': None})
+                resp = UPLOAD_SESSION.post(UPLOAD_APIS[table_name], json=json_param, timeout=API_TIMEOUT)
                 print(f"      HTTP状态码: {resp.status_code}")
                 print(f"      响应: {resp.text[:200] if resp.text else '(空)'}")
                 if resp.status_code == 200:
@@ -4045,13 +4258,118 @@ def run_review_detail_meituan(account_name: str, start_date: str, end_date: str,
 
 
 # ============================================================================
-# review_summary_dianping 任务
+# review_summary 公共配置
 # ============================================================================
-def run_review_summary_dianping(account_name: str, start_date: str, end_date: str,
-                                cookies: Dict = None, mtgsig: str = None, shop_info: List = None) -> Dict[str, Any]:
-    """执行review_summary_dianping任务
+REVIEW_SUMMARY_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # 评价时间输出格式
+# 评价导出Excel中用到的列（顺序与上传循环中的元组解包一致）
+REVIEW_SUMMARY_COLUMNS = [
+    '评价时间', '城市', '评价门店', '点评门店ID', '美团门店ID', '用户昵称', '星级', '评分',
+    '评价内容', '评价正文字数', '图片数', '视频数', '商家是否已经回复', '商家首次回复时间',
+    '是否消费后评价', '消费时间',
+]
+
+REVIEW_SUMMARY_EMPTY_DATETIME = "1970-01-01 00:00:00"  # 空时间占位值
+REVIEW_SUMMARY_POLL_INTERVAL = 2   # 下载中心轮询间隔（秒）
+REVIEW_SUMMARY_POLL_TIMEOUT = 60   # 等待文件生成的最长时间（秒）
+REVIEW_SUMMARY_DATETIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M")
+
+REVIEW_SUMMARY_TRIGGER_URL = "https://e.dianping.com/gateway/merchant/review/pc/reviewdownload"
+REVIEW_SUMMARY_LIST_URL = "https://e.dianping.com/gateway/merchant/downloadcenter/list"
+# 请求头/参数中与平台无关的固定部分，调用时只补充 Referer、mtgsig 等可变字段
+REVIEW_SUMMARY_BASE_HEADERS = {
+    'Accept': 'application/json, text/plain, */*',
+    'Content-Type': 'application/json',
+    'Origin': 'https://e.dianping.com',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+REVIEW_SUMMARY_BASE_PARAMS = {"yodaReady": "h5", "csecplatform": "4", "csecversion": "4.1.1"}
+REVIEW_SUMMARY_LIST_BASE_PARAMS = {'pageNo': 1, 'pageSize': 20, **REVIEW_SUMMARY_BASE_PARAMS}
+
+# 点评/美团评价汇总的差异配置
+REVIEW_SUMMARY_CONFIGS = {
+    "review_summary_dianping": {
+        "icon": "💬",
+        "label": "点评评价",
+        "platform": 1,
+        "referer": "https://e.dianping.com/app/merchant-workbench/index.html",
+        "file_keyword": "门店评价",           # 下载中心文件名需包含的关键字
+        "shop_id_field": "dianping_shop_id",  # 用于统计门店ID的字段
+        "replied_values": ("已回复",),        # 视为"已回复"的取值
+        "date_only_formats": [],              # 允许的纯日期格式（输出 YYYY-MM-DD）
+        "with_score_detail": True,            # 是否上传评分明细
+    },
+    "review_summary_meituan": {
+        "icon": "🍔",
+        "label": "美团评价",
+        "platform": 2,
+        "referer": "https://e.dianping.com/vg-platform-reviewmanage/shop-comment-mt/index.html",
+        "file_keyword": "评价",
+        "shop_id_field": "meituan_shop_id",
+        "replied_values": ("已回复", "是"),
+        "date_only_formats": ["%Y-%m-%d", "%Y/%m/%d"],
+        "with_score_detail": False,
+    },
+}
+
+
+def _review_safe_int(val: Any, default: Optional[int] = 0) -> Optional[int]:
+    """评价数据转整数，NaN/无效值返回默认值"""
+    if pd.isna(val):
+        return default
+    try:
+        return int(val)
+    except:
+        return default
+
+
+def _review_safe_str(val: Any, default: str = "") -> str:
+    """评价数据转字符串并去除首尾空白，NaN返回默认值"""
+    if pd.isna(val):
+        return default
+    return str(val).strip()
+
+
+def _review_format_datetime(dt_str: Any, date_only_formats: List[str] = ()) -> str:
+    """评价时间统一格式化为 YYYY-MM-DD HH:MM:SS
+
+    Args:
+        dt_str: Excel中的时间值
+        date_only_formats: 额外允许的纯日期格式，命中时输出 YYYY-MM-DD
+
+    Returns:
+        格式化后的时间字符串，空值返回 REVIEW_SUMMARY_EMPTY_DATETIME，无法解析时原样返回
+    """
+    if pd.isna(dt_str) or str(dt_str).strip() == '':
+        return REVIEW_SUMMARY_EMPTY_DATETIME
+    dt_str = str(dt_str).strip()
+    # 已是标准格式（绝大多数行）直接返回，无需解析再格式化
+    if len(dt_str) == 19 and dt_str[4] == '-' and dt_str[7] == '-' and dt_str[10] == ' ' and dt_str[13] == ':' and dt_str[16] == ':':
+        return dt_str
+    # 常见的 YYYY-MM-DD HH:MM[:SS] 先走C实现的 fromisoformat，失败再逐个 strptime
+    if len(dt_str) in (16, 19):
+        try:
+            return datetime.fromisoformat(dt_str.replace('/', '-')).strftime(REVIEW_SUMMARY_DATETIME_FORMAT)
+        except ValueError:
+            pass
+    for fmt in REVIEW_SUMMARY_DATETIME_FORMATS:
+        try:
+            return datetime.strptime(dt_str, fmt).strftime(REVIEW_SUMMARY_DATETIME_FORMAT)
+        except ValueError:
+            continue
+    for fmt in date_only_formats:
+        try:
+            return datetime.strptime(dt_str, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return dt_str
+
+
+def _run_review_summary(table_name: str, account_name: str, start_date: str, end_date: str,
+                        cookies: Dict = None, mtgsig: str = None, shop_info: List = None) -> Dict[str, Any]:
+    """执行评价汇总任务（点评/美团共用，差异见 REVIEW_SUMMARY_CONFIGS）
 
     Args:
+        table_name: 任务名称（review_summary_dianping / review_summary_meituan）
         account_name: 账户名称
         start_date: 开始日期
         end_date: 结束日期
@@ -4059,16 +4377,17 @@ def run_review_summary_dianping(account_name: str, start_date: str, end_date: st
         mtgsig: 外部传入的签名（可选）
         shop_info: 外部传入的门店信息（可选）
     """
-    table_name = "review_summary_dianping"
+    config = REVIEW_SUMMARY_CONFIGS[table_name]
+    label = config['label']
     log_collect(account_name, f"开始执行 {table_name} 日期={start_date}~{end_date}")
     print(f"\n{'=' * 60}")
-    print(f"💬 {table_name}")
+    print(f"{config['icon']} {table_name}")
     print(f"{'=' * 60}")
 
     result = {"task_name": table_name, "success": False, "record_count": 0, "error_message": "无"}
 
     try:
-        disable_proxy()
+        # 所有请求都走 trust_env=False 的Session，无需再调用 disable_proxy() 清理环境变量
         Path(SAVE_DIR).mkdir(parents=True, exist_ok=True)
 
         # 优先使用外部传入的数据（页面驱动模式）
@@ -4084,23 +4403,16 @@ def run_review_summary_dianping(account_name: str, start_date: str, end_date: st
             shop_info = api_data['shop_info']
         shop_ids = get_shop_ids(shop_info)
 
-        headers = {
-            'Accept': 'application/json, text/plain, */*',
-            'Content-Type': 'application/json',
-            'Origin': 'https://e.dianping.com',
-            'Referer': 'https://e.dianping.com/app/merchant-workbench/index.html',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+        headers = {**REVIEW_SUMMARY_BASE_HEADERS, 'Referer': config['referer']}
 
         session = get_session()
 
         # 触发下载
-        print(f"\n📤 触发下载任务...")
-        trigger_url = "https://e.dianping.com/gateway/merchant/review/pc/reviewdownload"
-        trigger_params = {"yodaReady": "h5", "csecplatform": "4", "csecversion": "4.1.1", "mtgsig": generate_mtgsig(cookies, mtgsig)}
-        trigger_payload = {"tagId": 0, "platform": 1, "shopIdStr": "0", "startDate": start_date, "endDate": end_date}
+        print(f"\n📤 触发{label}下载任务...")
+        trigger_params = {**REVIEW_SUMMARY_BASE_PARAMS, "mtgsig": generate_mtgsig(cookies, mtgsig)}
+        trigger_payload = {"tagId": 0, "platform": config['platform'], "shopIdStr": "0", "startDate": start_date, "endDate": end_date}
 
-        trigger_resp = session.post(trigger_url, params=trigger_params, headers=headers, cookies=cookies, json=trigger_payload, timeout=60)
+        trigger_resp = session.post(REVIEW_SUMMARY_TRIGGER_URL, params=trigger_params, headers=headers, cookies=cookies, json=trigger_payload, timeout=60)
         trigger_json = trigger_resp.json()
         print(f"   响应: {trigger_json}")
 
@@ -4118,13 +4430,15 @@ def run_review_summary_dianping(account_name: str, start_date: str, end_date: st
         # 等待文件生成
         print(f"\n⏳ 等待文件生成...")
         trigger_time = time.time()
+        poll_deadline = trigger_time + REVIEW_SUMMARY_POLL_TIMEOUT
+        # addTime 为 YYYY-MM-DD HH:MM:SS，可直接按字符串比较，无需逐条 strptime
+        trigger_cutoff = datetime.fromtimestamp(trigger_time - 10).strftime(REVIEW_SUMMARY_DATETIME_FORMAT)
         file_record = None
 
-        for _ in range(30):
-            time.sleep(2)
-            list_url = "https://e.dianping.com/gateway/merchant/downloadcenter/list"
-            list_params = {'pageNo': 1, 'pageSize': 20, 'yodaReady': 'h5', 'csecplatform': '4', 'csecversion': '4.1.1', 'mtgsig': generate_mtgsig(cookies, mtgsig)}
-            list_resp = session.get(list_url, params=list_params, headers=headers, cookies=cookies, timeout=30)
+        # 先查询再等待，文件已就绪时无需白等一个轮询间隔
+        while True:
+            list_params = {**REVIEW_SUMMARY_LIST_BASE_PARAMS, 'mtgsig': generate_mtgsig(cookies, mtgsig)}
+            list_resp = session.get(REVIEW_SUMMARY_LIST_URL, params=list_params, headers=headers, cookies=cookies, timeout=30)
             list_data = list_resp.json()
 
             # 检查是否登录失效
@@ -4139,19 +4453,19 @@ def run_review_summary_dianping(account_name: str, start_date: str, end_date: st
             if list_data.get('code') == 200:
                 for record in list_data.get('data', {}).get('records', []):
                     file_name = record.get('fileName', '')
-                    if '门店评价' in file_name and record.get('recordStatus') == 300 and record.get('downloadable') == "1" and record.get('fileUrl'):
-                        add_time = record.get('addTime', '')
-                        try:
-                            file_time = datetime.strptime(add_time, '%Y-%m-%d %H:%M:%S')
-                            if file_time.timestamp() >= trigger_time - 10:
-                                file_record = record
-                                print(f"   ✅ 文件已就绪: {file_name}")
-                                break
-                        except:
+                    if config['file_keyword'] in file_name and record.get('recordStatus') == 300 and record.get('downloadable') == "1" and record.get('fileUrl'):
+                        add_time = record.get('addTime')
+                        if not isinstance(add_time, str) or len(add_time) != len(trigger_cutoff):
+                            # 时间格式无法比较时沿用原逻辑，直接采用该记录
                             file_record = record
                             break
-            if file_record:
+                        if add_time >= trigger_cutoff:
+                            file_record = record
+                            print(f"   ✅ 文件已就绪: {file_name}")
+                            break
+            if file_record or time.time() >= poll_deadline:
                 break
+            time.sleep(REVIEW_SUMMARY_POLL_INTERVAL)
 
         if not file_record:
             raise Exception("文件生成超时")
@@ -4160,16 +4474,15 @@ def run_review_summary_dianping(account_name: str, start_date: str, end_date: st
 
         # 下载文件
         file_url = file_record['fileUrl']
-        file_name = file_record.get('fileName', f'点评评价_{start_date}_{end_date}.xlsx')
+        file_name = file_record.get('fileName', f'{label}_{start_date}_{end_date}.xlsx')
         save_path = str(Path(SAVE_DIR) / file_name)
 
         print(f"📥 正在下载文件...")
         print(f"   URL: {file_url[:80]}...")
         dl_resp = session.get(file_url, timeout=120, stream=True)
-        with open(save_path, 'wb') as f:
-            for chunk in dl_resp.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+        dl_resp.raw.decode_content = True
+        with open(save_path, 'wb', buffering=DOWNLOAD_BUFFER_SIZE) as f:
+            shutil.copyfileobj(dl_resp.raw, f, length=DOWNLOAD_BUFFER_SIZE)
         file_size = Path(save_path).stat().st_size
         print(f"✅ 文件已保存到: {save_path}")
         print(f"   文件大小: {file_size / 1024:.2f} KB")
@@ -4179,12 +4492,12 @@ def run_review_summary_dianping(account_name: str, start_date: str, end_date: st
             print(f"⚠️ 文件可能为空或无效 (大小: {file_size} 字节)")
 
         # 上传数据
-        print(f"\n📤 开始上传评价数据...")
+        print(f"\n📤 开始上传{label}数据...")
         try:
             df = pd.read_excel(save_path)
         except ValueError as e:
             if "Worksheet index" in str(e) or "0 worksheets found" in str(e):
-                print(f"⚠️ Excel文件为空(没有工作表)，该日期范围可能没有点评评价数据")
+                print(f"⚠️ Excel文件为空(没有工作表)，该日期范围可能没有{label}数据")
                 result["success"] = True
                 result["record_count"] = 0
                 result["error_message"] = "无数据"
@@ -4194,79 +4507,83 @@ def run_review_summary_dianping(account_name: str, start_date: str, end_date: st
         fail_count = 0
         shop_ids_found = set()
 
-        EMPTY_DATETIME = "1970-01-01 00:00:00"
+        date_only_formats = config['date_only_formats']
+        safe_int = _review_safe_int
+        safe_str = _review_safe_str
 
         def format_datetime(dt_str):
-            if pd.isna(dt_str) or str(dt_str).strip() == '':
-                return EMPTY_DATETIME
-            dt_str = str(dt_str).strip()
-            for fmt in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M"]:
-                try:
-                    return datetime.strptime(dt_str, fmt).strftime("%Y-%m-%d %H:%M:%S")
-                except:
-                    continue
-            return dt_str
-
-        def safe_int(val, default=0):
-            if pd.isna(val):
-                return default
-            try:
-                return int(val)
-            except:
-                return default
-
-        def safe_str(val, default=""):
-            if pd.isna(val):
-                return default
-            return str(val).strip()
-
-        for idx, row in df.iterrows():
+            return _review_format_datetime(dt_str, date_only_formats)
+
+        # 固定列顺序后用 itertuples 逐行解包，避免 iterrows 为每行构造 Series；缺失列补为NaN
+        row_count = len(df)
+        rows = df.reindex(columns=REVIEW_SUMMARY_COLUMNS).itertuples(index=False, name=None)
+        shop_id_field = config['shop_id_field']
+        replied_values = config['replied_values']
+        pending_uploads = []  # (行号, 上传参数)
+
+        for idx, (review_time, raw_city, shop_name, dp_shop_id, mt_shop_id, user_nickname, star, score_detail,
+                  raw_content, content_length, pic_count, video_count, replied, first_reply_time,
+                  after_consume, consume_time) in enumerate(rows):
             try:
-                content = safe_str(row.get('评价内容')) or '无'
-                is_replied = "是" if row.get('商家是否已经回复') == '已回复' else "否"
-                is_after_consume = "是" if row.get('是否消费后评价') == '是' else "否"
-                dp_shop_id = safe_int(row.get('点评门店ID'), None)
-                if dp_shop_id:
-                    shop_ids_found.add(dp_shop_id)
+                content = safe_str(raw_content) or '无'
+                city = sys.intern(safe_str(raw_city))  # 城市名重复度高，驻留字符串（NaN 已由 safe_str 转为空串）
 
                 params = {
-                    "review_time": format_datetime(row.get('评价时间')),
-                    "city": safe_str(row.get('城市')),
-                    "shop_name": safe_str(row.get('评价门店')),
-                    "dianping_shop_id": dp_shop_id,
-                    "meituan_shop_id": safe_int(row.get('美团门店ID'), None),
-                    "user_nickname": safe_str(row.get('用户昵称')),
-                    "star": safe_str(row.get('星级')),
-                    "score_detail": safe_str(row.get('评分')),
+                    "review_time": format_datetime(review_time),
+                    "city": city,
+                    "shop_name": safe_str(shop_name),
+                    "dianping_shop_id": safe_int(dp_shop_id, None),
+                    "meituan_shop_id": safe_int(mt_shop_id, None),
+                    "user_nickname": safe_str(user_nickname),
+                    "star": safe_str(star),
                     "content": content,
-                    "content_length": safe_int(row.get('评价正文字数'), len(content)),
-                    "pic_count": safe_int(row.get('图片数'), 0),
-                    "video_count": safe_int(row.get('视频数'), 0),
-                    "is_replied": is_replied,
-                    "first_reply_time": format_datetime(row.get('商家首次回复时间')),
-                    "is_after_consume": is_after_consume,
-                    "consume_time": format_datetime(row.get('消费时间'))
+                    "content_length": safe_int(content_length, len(content)),
+                    "pic_count": safe_int(pic_count, 0),
+                    "video_count": safe_int(video_count, 0),
+                    "is_replied": "是" if replied in replied_values else "否",
+                    "first_reply_time": format_datetime(first_reply_time),
+                    "is_after_consume": "是" if after_consume == '是' else "否",
+                    "consume_time": format_datetime(consume_time)
                 }
-
-                print(f"\n   [{idx+1}/{len(df)}] 上传点评评价:")
-                print(f"      shop_name={params.get('shop_name')}, dianping_shop_id={params.get('dianping_shop_id')}")
-                print(f"      user_nickname={params.get('user_nickname')}, content={params.get('content', '')[:50]}...")
-                resp = requests.post(UPLOAD_APIS[table_name], headers={'Content-Type': 'application/json'},
-                                     data=json.dumps(params, ensure_ascii=False).encode('utf-8'),
-                                     timeout=30, proxies={'http': None, 'https': None})
-                print(f"      HTTP状态码: {resp.status_code}")
-                print(f"      响应: {resp.text[:200] if resp.text else '(空)'}")
-                if resp.status_code == 200:
-                    success_count += 1
-                    print(f"      ✅ 成功")
-                else:
-                    fail_count += 1
-                    print(f"      ❌ 失败")
-                    print(f"      完整参数: {json.dumps(params, ensure_ascii=False)}")
+                if config['with_score_detail']:
+                    params["score_detail"] = safe_str(score_detail)
+                shop_id = params[shop_id_field]
+                if shop_id:
+                    shop_ids_found.add(shop_id)
+
+                # 逐行明细仅在DEBUG级别输出，避免大文件上传时刷屏
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"[{idx+1}/{row_count}] 上传{label}: shop_name={params['shop_name']}, "
+                                 f"{shop_id_field}={shop_id}, user_nickname={params['user_nickname']}, "
+                                 f"content={params['content'][:50]}...")
+                pending_uploads.append((idx, params))
             except Exception as e:
                 fail_count += 1
-                print(f"      ❌ 异常: {e}")
-                print(f"      完整参数: {json.dumps(params, ensure_ascii=False)}")
+                print(f"   [{idx+1}/{row_count}] ❌ 解析{label}异常: {e}")
+
+        # 并发上传：多个请求同时在 UPLOAD_SESSION 的连接池上发送，不再逐行等待响应
+        upload_url = UPLOAD_APIS[table_name]
+        with ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(UPLOAD_SESSION.post, upload_url, headers={'Content-Type': 'application/json'},
+                                data=json_dumps_bytes(params), timeout=30): (idx, params)
+                for idx, params in pending_uploads
+            }
+            for future in as_completed(futures):
+                idx, params = futures[future]
+                try:
+                    resp = future.result()
+                    if resp.status_code == 200:
+                        success_count += 1
+                    else:
+                        fail_count += 1
+                        print(f"   [{idx+1}/{row_count}] ❌ 上传{label}失败: HTTP {resp.status_code}, "
+                              f"响应: {resp.text[:200] if resp.text else '(空)'}")
+                        print(f"      完整参数: {json.dumps(params, ensure_ascii=False)}")
+                except Exception as e:
+                    fail_count += 1
+                    print(f"   [{idx+1}/{row_count}] ❌ 上传{label}异常: {e}")
+                    print(f"      完整参数: {json.dumps(params, ensure_ascii=False)}")
 
         print(f"\n✅ 上传完成: 成功 {success_count}, 失败 {fail_count}")
 
@@ -4300,6 +4617,25 @@ def run_review_summary_dianping(account_name: str, start_date: str, end_date: st
     return result
 
 
+# ============================================================================
+# review_summary_dianping 任务
+# ============================================================================
+def run_review_summary_dianping(account_name: str, start_date: str, end_date: str,
+                                cookies: Dict = None, mtgsig: str = None, shop_info: List = None) -> Dict[str, Any]:
+    """执行review_summary_dianping任务
+
+    Args:
+        account_name: 账户名称
+        start_date: 开始日期
+        end_date: 结束日期
+        cookies: 外部传入的Cookie（可选，避免重复调用API）
+        mtgsig: 外部传入的签名（可选）
+        shop_info: 外部传入的门店信息（可选）
+    """
+    return _run_review_summary("review_summary_dianping", account_name, start_date, end_date,
+                               cookies=cookies, mtgsig=mtgsig, shop_info=shop_info)
+
+
 # ============================================================================
 # review_summary_meituan 任务
 # ============================================================================
@@ -4315,248 +4651,114 @@ def run_review_summary_meituan(account_name: str, start_date: str, end_date: str
         mtgsig: 外部传入的签名（可选）
         shop_info: 外部传入的门店信息（可选）
     """
-    table_name = "review_summary_meituan"
-    log_collect(account_name, f"开始执行 {table_name} 日期={start_date}~{end_date}")
-    print(f"\n{'=' * 60}")
-    print(f"🍔 {table_name}")
-    print(f"{'=' * 60}")
+    return _run_review_summary("review_summary_meituan", account_name, start_date, end_date,
+                               cookies=cookies, mtgsig=mtgsig, shop_info=shop_info)
 
-    result = {"task_name": table_name, "success": False, "record_count": 0, "error_message": "无"}
 
-    try:
-        disable_proxy()
-        Path(SAVE_DIR).mkdir(parents=True, exist_ok=True)
+# ============================================================================
+# store_stats 共享浏览器 (独立模式下进程内只启动一次Playwright/Chromium，各账号使用独立Context)
+# ============================================================================
+# Playwright 同步API的对象只能在创建它的线程中使用，因此按线程各保存一份
+_store_stats_browser_local = threading.local()
 
-        # 优先使用外部传入的数据（页面驱动模式）
-        if cookies and mtgsig:
-            print(f"📌 使用共享 Cookie/签名（无需调用API）")
-            if not shop_info:
-                shop_info = []
-        else:
-            # 没有外部数据，从API获取
-            api_data = load_cookies_from_api(account_name)
-            cookies = api_data['cookies']
-            mtgsig = api_data['mtgsig']
-            shop_info = api_data['shop_info']
-        shop_ids = get_shop_ids(shop_info)
 
-        headers = {
-            'Accept': 'application/json, text/plain, */*',
-            'Content-Type': 'application/json',
-            'Origin': 'https://e.dianping.com',
-            'Referer': 'https://e.dianping.com/vg-platform-reviewmanage/shop-comment-mt/index.html',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+def get_store_stats_browser(headless: bool = True, install_browser=None):
+    """获取当前线程共享的Chromium浏览器（首次调用时启动，断开后自动重新启动）
 
-        session = get_session()
+    Args:
+        headless: 是否使用无头模式（仅在启动浏览器时生效）
+        install_browser: 浏览器未安装时调用的安装函数，返回是否安装成功
 
-        # 触发下载
-        print(f"\n📤 触发美团评价下载任务...")
-        trigger_url = "https://e.dianping.com/gateway/merchant/review/pc/reviewdownload"
-        trigger_params = {"yodaReady": "h5", "csecplatform": "4", "csecversion": "4.1.1", "mtgsig": generate_mtgsig(cookies, mtgsig)}
-        trigger_payload = {"tagId": 0, "platform": 2, "shopIdStr": "0", "startDate": start_date, "endDate": end_date}
+    Returns:
+        Playwright Browser 对象
+    """
+    local = _store_stats_browser_local
+    browser = getattr(local, 'browser', None)
+    if browser is not None and browser.is_connected():
+        return browser
+
+    if getattr(local, 'playwright', None) is None:
+        local.playwright = sync_playwright().start()
+        if threading.current_thread() is threading.main_thread():
+            atexit.register(close_store_stats_browser)
+
+    max_retries = 2
+    for attempt in range(max_retries):
+        try:
+            local.browser = local.playwright.chromium.launch(headless=headless, proxy=None,
+                                                             args=list(CHROMIUM_LAUNCH_ARGS))
+            break
+        except Exception as e:
+            if "Executable doesn't exist" in str(e) and attempt == 0 and install_browser:
+                if install_browser():
+                    continue
+                else:
+                    raise Exception("浏览器安装失败")
+            raise e
+    return local.browser
 
-        trigger_resp = session.post(trigger_url, params=trigger_params, headers=headers, cookies=cookies, json=trigger_payload, timeout=60)
-        trigger_json = trigger_resp.json()
-        print(f"   响应: {trigger_json}")
 
-        # 检查触发响应是否登录失效
-        trigger_code = trigger_json.get('code')
-        trigger_msg = trigger_json.get('msg') or trigger_json.get('message') or ''
-        if is_auth_invalid_error(trigger_code, trigger_msg):
-            error_msg = f"登录失效 (code={trigger_code}, msg={trigger_msg})"
-            print(f"🚨 检测到登录失效: {error_msg}")
-            handle_auth_invalid(account_name, start_date, end_date, table_name, error_msg)
-            raise AuthInvalidError(error_msg)
+def _abort_heavy_resources(route):
+    """Playwright 路由回调：拦截图片/样式/字体等与数据采集无关的资源"""
+    if route.request.resource_type in STORE_STATS_BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
 
-        random_delay()  # 反爬虫等待
 
-        # 等待文件生成
-        print(f"\n⏳ 等待文件生成...")
-        trigger_time = time.time()
-        file_record = None
+def _abort_media_resources(route):
+    """Playwright 路由回调：只拦截图片/字体/媒体资源（保留样式，页面交互不受影响）"""
+    if route.request.resource_type in PAGE_DRIVEN_BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
 
-        for _ in range(30):
-            time.sleep(2)
-            list_url = "https://e.dianping.com/gateway/merchant/downloadcenter/list"
-            list_params = {'pageNo': 1, 'pageSize': 20, 'yodaReady': 'h5', 'csecplatform': '4', 'csecversion': '4.1.1', 'mtgsig': generate_mtgsig(cookies, mtgsig)}
-            list_resp = session.get(list_url, params=list_params, headers=headers, cookies=cookies, timeout=30)
-            list_data = list_resp.json()
 
-            # 检查是否登录失效
-            list_code = list_data.get('code')
-            list_msg = list_data.get('msg') or list_data.get('message') or ''
-            if is_auth_invalid_error(list_code, list_msg):
-                error_msg = f"登录失效 (code={list_code}, msg={list_msg})"
-                print(f"🚨 检测到登录失效: {error_msg}")
-                handle_auth_invalid(account_name, start_date, end_date, table_name, error_msg)
-                raise AuthInvalidError(error_msg)
-
-            if list_data.get('code') == 200:
-                for record in list_data.get('data', {}).get('records', []):
-                    file_name = record.get('fileName', '')
-                    if ('评价' in file_name or '门店评价' in file_name) and record.get('recordStatus') == 300 and record.get('downloadable') == "1" and record.get('fileUrl'):
-                        add_time = record.get('addTime', '')
-                        try:
-                            file_time = datetime.strptime(add_time, '%Y-%m-%d %H:%M:%S')
-                            if file_time.timestamp() >= trigger_time - 10:
-                                file_record = record
-                                print(f"   ✅ 文件已就绪: {file_name}")
-                                break
-                        except:
-                            file_record = record
-                            break
-            if file_record:
-                break
-
-        if not file_record:
-            raise Exception("文件生成超时")
-
-        random_delay()  # 反爬虫等待
-
-        # 下载文件
-        file_url = file_record['fileUrl']
-        file_name = file_record.get('fileName', f'美团评价_{start_date}_{end_date}.xlsx')
-        save_path = str(Path(SAVE_DIR) / file_name)
-
-        print(f"📥 正在下载文件...")
-        print(f"   URL: {file_url[:80]}...")
-        dl_resp = session.get(file_url, timeout=120, stream=True)
-        with open(save_path, 'wb') as f:
-            for chunk in dl_resp.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        file_size = Path(save_path).stat().st_size
-        print(f"✅ 文件已保存到: {save_path}")
-        print(f"   文件大小: {file_size / 1024:.2f} KB")
-
-        # 检查文件是否为空或无效
-        if file_size < 1000:
-            print(f"⚠️ 文件可能为空或无效 (大小: {file_size} 字节)")
-
-        # 上传数据
-        print(f"\n📤 开始上传美团评价数据...")
-        try:
-            df = pd.read_excel(save_path)
-        except ValueError as e:
-            if "Worksheet index" in str(e) or "0 worksheets found" in str(e):
-                print(f"⚠️ Excel文件为空(没有工作表)，该日期范围可能没有美团评价数据")
-                result["success"] = True
-                result["record_count"] = 0
-                result["error_message"] = "无数据"
-                return result
-            raise
-        success_count = 0
-        fail_count = 0
-        shop_ids_found = set()
-
-        EMPTY_DATETIME = "1970-01-01 00:00:00"
-
-        def format_datetime(dt_str):
-            if pd.isna(dt_str) or str(dt_str).strip() == '':
-                return EMPTY_DATETIME
-            dt_str = str(dt_str).strip()
-            for fmt in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y-%m-%d", "%Y/%m/%d"]:
-                try:
-                    dt = datetime.strptime(dt_str, fmt)
-                    if fmt in ["%Y-%m-%d", "%Y/%m/%d"]:
-                        return dt.strftime("%Y-%m-%d")
-                    return dt.strftime("%Y-%m-%d %H:%M:%S")
-                except:
-                    continue
-            return dt_str
-
-        def safe_int(val, default=0):
-            if pd.isna(val):
-                return default
-            try:
-                return int(val)
-            except:
-                return default
-
-        def safe_str(val, default=""):
-            if pd.isna(val):
-                return default
-            return str(val).strip()
-
-        for idx, row in df.iterrows():
-            try:
-                content = safe_str(row.get('评价内容')) or '无'
-                is_replied_raw = row.get('商家是否已经回复')
-                is_replied = "是" if is_replied_raw == '已回复' or is_replied_raw == '是' else "否"
-                is_after_consume = "是" if row.get('是否消费后评价') == '是' else "否"
-                mt_shop_id = safe_int(row.get('美团门店ID'), None)
-                if mt_shop_id:
-                    shop_ids_found.add(mt_shop_id)
-
-                params = {
-                    "review_time": format_datetime(row.get('评价时间')),
-                    "city": safe_str(row.get('城市')),
-                    "shop_name": safe_str(row.get('评价门店')),
-                    "dianping_shop_id": safe_int(row.get('点评门店ID'), None),
-                    "meituan_shop_id": mt_shop_id,
-                    "user_nickname": safe_str(row.get('用户昵称')),
-                    "star": safe_str(row.get('星级')),
-                    "content": content,
-                    "content_length": safe_int(row.get('评价正文字数'), len(content)),
-                    "pic_count": safe_int(row.get('图片数'), 0),
-                    "video_count": safe_int(row.get('视频数'), 0),
-                    "is_replied": is_replied,
-                    "first_reply_time": format_datetime(row.get('商家首次回复时间')),
-                    "is_after_consume": is_after_consume,
-                    "consume_time": format_datetime(row.get('消费时间'))
-                }
-
-                print(f"\n   [{idx+1}/{len(df)}] 上传美团评价:")
-                print(f"      shop_name={params.get('shop_name')}, meituan_shop_id={params.get('meituan_shop_id')}")
-                print(f"      user_nickname={params.get('user_nickname')}, content={params.get('content', '')[:50]}...")
-                resp = requests.post(UPLOAD_APIS[table_name], headers={'Content-Type': 'application/json'},
-                                     data=json.dumps(params, ensure_ascii=False).encode('utf-8'),
-                                     timeout=30, proxies={'http': None, 'https': None})
-                print(f"      HTTP状态码: {resp.status_code}")
-                print(f"      响应: {resp.text[:200] if resp.text else '(空)'}")
-                if resp.status_code == 200:
-                    success_count += 1
-                    print(f"      ✅ 成功")
-                else:
-                    fail_count += 1
-                    print(f"      ❌ 失败")
-                    print(f"      完整参数: {json.dumps(params, ensure_ascii=False)}")
-            except Exception as e:
-                fail_count += 1
-                print(f"      ❌ 异常: {e}")
-                print(f"      完整参数: {json.dumps(params, ensure_ascii=False)}")
-
-        print(f"\n✅ 上传完成: 成功 {success_count}, 失败 {fail_count}")
-
-        if fail_count == 0:
-            result["success"] = True
-            result["record_count"] = success_count
-            for shop_id in (shop_ids_found or shop_ids):
-                log_success(account_name, shop_id, table_name, start_date, end_date, success_count)
-        else:
-            result["error_message"] = f"部分上传失败: 成功{success_count}, 失败{fail_count}"
-            for shop_id in shop_ids:
-                log_failure(account_name, shop_id, table_name, start_date, end_date, result["error_message"])
+def new_store_stats_context(browser, cookies: Optional[List[dict]] = None, storage_state: Optional[str] = None):
+    """在共享浏览器上为单个账户创建独立的Context（Cookie/存储互相隔离）
 
-    except AuthInvalidError as e:
-        # 登录失效异常 - 已在检测时调用 handle_auth_invalid，这里只记录结果
-        result["error_message"] = str(e)
-        print(f"❌ 登录失效，任务终止: {e}")
+    Args:
+        browser: get_store_stats_browser() 返回的共享浏览器
+        cookies: Playwright 格式的Cookie列表（可选）
+        storage_state: 保存的登录状态文件路径（可选）
 
+    Returns:
+        Playwright BrowserContext 对象（用完后只需关闭Context，浏览器继续复用）
+    """
+    context = browser.new_context(
+        storage_state=storage_state,
+        viewport={'width': 1920, 'height': 1080},
+        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        proxy=None, bypass_csp=True, ignore_https_errors=True
+    )
+    if cookies:
+        context.add_cookies(cookies)
+    context.route("**/*", _abort_heavy_resources)
+    return context
+
+
+def close_store_stats_browser():
+    """关闭当前线程的共享浏览器并停止Playwright"""
+    local = _store_stats_browser_local
+    browser = getattr(local, 'browser', None)
+    playwright = getattr(local, 'playwright', None)
+    local.browser = None
+    local.playwright = None
+    try:
+        if browser is not None and browser.is_connected():
+            browser.close()
     except Exception as e:
-        result["error_message"] = str(e)
-        print(f"❌ 执行失败: {e}")
-        import traceback
-        traceback.print_exc()
-        log_failure(account_name, 0, table_name, start_date, end_date, str(e))
+        logger.debug(f"关闭共享浏览器失败: {e}")
+    try:
+        if playwright is not None:
+            playwright.stop()
+    except Exception as e:
+        logger.debug(f"停止Playwright失败: {e}")
 
-    if result.get("success"):
-        log_collect(account_name, f"{table_name} 完成，记录数={result.get('record_count', 0)}")
-    else:
-        log_collect(account_name, f"{table_name} 失败: {result.get('error_message', '未知')}", "ERROR")
 
-    return result
+# 财务余额缓存（进程内共享）: account_name -> (获取时间, 余额)
+_finance_balance_cache: Dict[str, Tuple[float, float]] = {}
+_finance_balance_cache_lock = threading.Lock()
 
 
 # ============================================================================
@@ -4565,6 +4767,64 @@ def run_review_summary_meituan(account_name: str, start_date: str, end_date: str
 class DianpingStoreStats:
     """大众点评门店统计数据采集类（带Playwright支持）"""
 
+    # 登录状态探测脚本：一次 evaluate 返回全部判断信号，避免多次 CDP 往返
+    _LOGIN_PROBE_JS = """() => ({
+        url: location.href,
+        textLen: (document.body && document.body.textContent) ? document.body.textContent.length : 0,
+        hasLoginForm: !!document.querySelector('input[type=password]')
+    })"""
+
+    # 固定请求头/参数（类定义时创建一次，只读，各请求直接复用）
+    _H5_FORM_HEADERS = MappingProxyType({
+        'Accept': 'application/json, text/plain, */*',
+        'Accept-Language': 'zh-CN,zh;q=0.9',
+        'Connection': 'keep-alive',
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'Origin': 'https://h5.dianping.com',
+        'Referer': 'https://h5.dianping.com/',
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    })
+    _ADVISER_HEADERS = MappingProxyType({
+        'Accept': 'application/json, text/plain, */*',
+        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        'Connection': 'keep-alive',
+        'Referer': 'https://e.dianping.com/codejoy/2703/home/index.html',
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    })
+    _ADVISER_JSON_HEADERS = MappingProxyType({**_ADVISER_HEADERS, 'Content-Type': 'application/json'})
+    # 报表Excel中实际用到的列（按位置），读取时通过 usecols 跳过其余列的解析
+    _FLOW_REPORT_COLUMNS = (0, 3, 36)    # 日期, 门店ID, 打卡数
+    _RANK_REPORT_COLUMNS = (4, 10, 14)   # 门店ID, 下单人数排名, 核销金额排名
+    _TRADE_REPORT_COLUMNS = (2, 6, 8)    # 商品ID, 门店ID, 下单人数
+    _NOTICE_CENTER_HEADERS = MappingProxyType({
+        'Accept': 'application/json, text/plain, */*',
+        'Content-Type': 'application/json',
+        'Referer': 'https://e.dianping.com/app/vg-pc-platform-merchant-selfhelp/newNoticeCenter.html',
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    })
+    _CSEC_PARAMS = MappingProxyType({
+        'yodaReady': 'h5',
+        'csecplatform': '4',
+        'csecversion': '4.1.1'
+    })
+    _SHOP_INFO_BODY = json_dumps_bytes({
+        "bizType": "pc-shouye",
+        "device": "pc",
+        "currentTab": "city",
+        "shopIds": "0"
+    })
+    # compareRegions 中需要的商圈层级：type -> compareRegions_json 中的键
+    _REGION_TYPE_KEYS = MappingProxyType({'城市': 'city', '行政区': 'district', '商圈': 'business'})
+    _REGION_BASE_PARAMS = MappingProxyType({
+        'device': 'pc',
+        'source': '1',
+        'pageType': 'compareRegions',
+        'sign': '',
+        'yodaReady': 'h5',
+        'csecplatform': '4',
+        'csecversion': '4.1.1'
+    })
+
     def __init__(self, account_name: str, platform_api_url: str, headless: bool = True, disable_proxy: bool = True,
                  external_page=None, cookies: Dict = None, mtgsig: str = None, shop_info: List = None,
                  compare_regions: Dict = None, brands_json: List = None):
@@ -4587,9 +4847,10 @@ class DianpingStoreStats:
         self.headless = headless
         self.disable_proxy = disable_proxy
         self.state_file = os.path.join(STATE_DIR, f'dianping_state_{account_name}.json')
+        self.report_cache_dir = os.path.join(STATE_DIR, 'report_cache', account_name)
+        self._report_cache_pruned = False
 
-        # Playwright相关
-        self.playwright = None
+        # Playwright相关（browser 为进程内共享实例，见 get_store_stats_browser）
         self.browser = None
         self.context = None
         self.page = None
@@ -4601,12 +4862,17 @@ class DianpingStoreStats:
         # 登录失效标志 - 一旦检测到失效，停止后续数据获取
         self.login_invalid = False
         self.login_invalid_error = ""
+        self._login_state_lock = threading.Lock()  # 财务余额与页面采集并发执行，登录失效标志需加锁更新
 
         # 从API获取的数据
         self.cookies = {}
+        self._playwright_cookies = []  # cookies 转换后的 Playwright 格式（加载账户信息时生成一次）
         self.mtgsig_from_api = None
         self.shop_id = None
         self.shop_list = []
+        self._shop_by_id = {}  # shop_id(str) -> 门店信息，shop_list 变更后由 _index_shops 重建
+        self._shop_to_brand = {}  # shop_id -> 团购ID（来自 product_mapping）
+        self._shop_region_id = {}  # shop_id -> 商圈 regionId（来自 shop_region_info）
         self.product_mapping = []
         self.shop_region_info = {}
         self.cookie_data = None
@@ -4618,6 +4884,17 @@ class DianpingStoreStats:
         self._external_compare_regions = compare_regions
         self._external_brands_json = brands_json
 
+        # 共享的HTTP Session（首次使用时创建，所有接口调用复用同一连接池）
+        self._session = None
+
+        # 商圈接口限速状态（多线程获取商圈数据时共享）
+        self._region_rate_lock = threading.Lock()
+        self._region_next_request_at = 0.0
+        # 点评数据接口令牌桶（按请求限速，替代采集阶段之间的固定等待）
+        self._dianping_rate_lock = threading.Lock()
+        self._dianping_tokens = float(DIANPING_REQUEST_BURST)
+        self._dianping_tokens_at = time.monotonic()
+
         if self.disable_proxy:
             self._disable_proxy()
 
@@ -4637,13 +4914,22 @@ class DianpingStoreStats:
         print("✅ 已禁用系统代理")
 
     def _get_session(self) -> requests.Session:
-        """获取禁用代理的session"""
-        session = requests.Session()
-        session.trust_env = False
-        session.proxies = {'http': None, 'https': None, 'ftp': None, 'socks': None, 'no_proxy': '*'}
-        session.mount('http://', requests.adapters.HTTPAdapter())
-        session.mount('https://', requests.adapters.HTTPAdapter())
-        return session
+        """获取禁用代理的共享session（首次调用时创建，之后复用keep-alive连接）"""
+        if self._session is None:
+            session = requests.Session()
+            session.trust_env = False
+            session.proxies = {'http': None, 'https': None}
+            # 连接池容量需覆盖商圈并发请求，否则多余连接会被丢弃并重新握手；
+            # GET 遇到 5xx/连接重置自动重试，重试耗尽时仍返回最后的响应交给调用方判断；
+            # POST（含数据上传）不按状态码/读超时重试，避免服务端已写入后重复上传。
+            # 平台API为 http://，点评接口为 https://，两个前缀共用同一个 adapter
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                          allowed_methods=frozenset(['GET']), raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=32, max_retries=retry)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
 
     def _load_account_info_from_api(self):
         """加载账户信息（优先使用外部传入数据，没有才调用API）"""
@@ -4654,7 +4940,7 @@ class DianpingStoreStats:
 
                 # 使用外部传入的数据
                 self.cookies = self._external_cookies
-                print(f"✅ 成功加载 {len(self.cookies)} 个cookies（来自共享数据）")
+                logger.debug("成功加载 %d 个cookies（来自共享数据）", len(self.cookies))
 
                 if self._external_mtgsig:
                     self.mtgsig_from_api = self._external_mtgsig
@@ -4671,8 +4957,9 @@ class DianpingStoreStats:
 
                 if self.shop_list:
                     print(f"✅ 成功加载 {len(self.shop_list)} 个门店（来自共享数据）")
-                    for shop in self.shop_list:
-                        print(f"   - {shop.get('shop_name')} ({shop.get('shop_id')})")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        for shop in self.shop_list:
+                            logger.debug("   - %s (%s)", shop.get('shop_name'), shop.get('shop_id'))
                 else:
                     # 门店信息为空，需要从API获取
                     print(f"⚠️ 共享数据中无门店信息，从API补充获取...")
@@ -4693,27 +4980,19 @@ class DianpingStoreStats:
                 if not self.shop_id and self.shop_list:
                     self.shop_id = self.shop_list[0].get('shop_id')
 
-                # 检测并补全门店/商圈数据（任一为空则触发）
-                self._check_and_complete_stores_regions()
+                self._playwright_cookies = self._convert_cookies_to_playwright_format(self.cookies)
+                self._attach_session_cookies()
+
+                # 检测并补全门店/商圈数据（任一为空则触发；共享数据完整时不产生额外请求）
+                if not (self.shop_list and self.shop_region_info):
+                    self._check_and_complete_stores_regions()
+                self._index_shops()
 
                 return
 
             # 没有外部数据，从API获取完整信息
             print(f"🔍 正在从API获取账户 [{self.account_name}] 的完整信息...")
-            headers = {'Content-Type': 'application/json'}
-            data = json.dumps({"account": self.account_name})
-
-            session = self._get_session()
-            response = session.post(self.platform_api_url, headers=headers, data=data, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-
-            if not result or not result.get('success'):
-                raise Exception(f"API返回失败")
-
-            data = result.get('data', {})
-            if not data:
-                raise Exception(f"API返回的data为空")
+            data = self._request_account_data()
 
             self.cookie_data = data
 
@@ -4721,7 +5000,7 @@ class DianpingStoreStats:
             cookie_data = data.get('cookie', {})
             if cookie_data:
                 self.cookies = cookie_data
-                print(f"✅ 成功加载 {len(self.cookies)} 个cookies")
+                logger.debug("成功加载 %d 个cookies", len(self.cookies))
             else:
                 raise Exception("未获取到cookie数据")
 
@@ -4739,8 +5018,9 @@ class DianpingStoreStats:
             if stores_json:
                 self.shop_list = stores_json
                 print(f"✅ 成功加载 {len(self.shop_list)} 个门店")
-                for shop in self.shop_list:
-                    print(f"   - {shop.get('shop_name')} ({shop.get('shop_id')})")
+                if logger.isEnabledFor(logging.DEBUG):
+                    for shop in self.shop_list:
+                        logger.debug("   - %s (%s)", shop.get('shop_name'), shop.get('shop_id'))
             else:
                 # API未返回门店列表，尝试从大众点评直接获取（兜底）
                 print(f"⚠️ API未返回门店列表，尝试从大众点评直接获取...")
@@ -4768,30 +5048,129 @@ class DianpingStoreStats:
             if not self.shop_id and stores_json:
                 self.shop_id = stores_json[0].get('shop_id')
 
+            self._playwright_cookies = self._convert_cookies_to_playwright_format(self.cookies)
+            self._attach_session_cookies()
+
             # 检测并补全门店/商圈数据（任一为空则触发）
             self._check_and_complete_stores_regions()
+            self._index_shops()
 
         except Exception as e:
             print(f"❌ 加载账户信息失败: {e}")
             raise
 
-    def _fetch_additional_info_from_api(self):
-        """从API补充获取额外信息（门店列表、团购映射、商圈信息）"""
+    def _attach_session_cookies(self):
+        """将账户Cookie挂到共享Session上（限定 .dianping.com 域，不会发往平台API/上传接口），
+        之后点评接口请求无需再逐次传入 cookies"""
+        jar = self._get_session().cookies
+        for name, value in self.cookies.items():
+            jar.set(name, value, domain='.dianping.com', path='/')
+
+    def _mark_login_invalid(self, error: str):
+        """标记登录失效（线程安全，只保留第一次检测到的原因）"""
+        with self._login_state_lock:
+            if not self.login_invalid:
+                self.login_invalid = True
+                self.login_invalid_error = error
+        # 登录失效后缓存的余额不再可信
+        with _finance_balance_cache_lock:
+            _finance_balance_cache.pop(self.account_name, None)
+
+    def _index_shops(self):
+        """按 shop_id 建立门店/团购ID/商圈索引（shop_list、product_mapping、shop_region_info 变更后调用）"""
+        self._shop_by_id = {str(s.get('shop_id', '')): s for s in self.shop_list}
+        # 缺少 shop_id/brands_id 的映射项直接跳过，只影响该门店的广告单数据，不中断账户信息加载
+        self._shop_to_brand = {
+            item.get('shop_id'): item.get('brands_id')
+            for item in (self.product_mapping or [])
+            if item.get('shop_id') is not None and item.get('brands_id') is not None
+        }
+        self._shop_region_id = {
+            shop_id: info.get('regions', {}).get('business', {}).get('regionId')
+            for shop_id, info in (self.shop_region_info or {}).items()
+        }
+
+    def _download_report(self, file_url: str, cache_key: str) -> BytesIO:
+        """下载报表Excel，REPORT_CACHE_TTL 内相同报表直接返回本地缓存
+
+        Args:
+            file_url: 报表文件下载地址（每次生成都不同，不能作为缓存键）
+            cache_key: 报表缓存键（componentId + 日期 + 门店等能唯一确定报表内容的参数）
+
+        Returns:
+            文件内容（已定位到开头的 BytesIO）
+        """
+        cache_file = os.path.join(self.report_cache_dir, f"{cache_key}.xlsx")
         try:
-            headers = {'Content-Type': 'application/json'}
-            data = json.dumps({"account": self.account_name})
+            if time.time() - os.path.getmtime(cache_file) < REPORT_CACHE_TTL:
+                with open(cache_file, 'rb') as f:
+                    logger.debug(f"使用报表缓存: {cache_key}")
+                    return BytesIO(f.read())
+        except OSError:
+            pass
 
-            session = self._get_session()
-            response = session.post(self.platform_api_url, headers=headers, data=data, timeout=30)
+        # 流式读取到单个缓冲区，避免 response.content 与 BytesIO 各持有一份完整文件
+        buf = BytesIO()
+        with self._get_session().get(file_url, timeout=60, stream=True) as response:
             response.raise_for_status()
-            result = response.json()
+            response.raw.decode_content = True
+            shutil.copyfileobj(response.raw, buf, DOWNLOAD_BUFFER_SIZE)
 
-            if not result or not result.get('success'):
-                return
+        tmp_file = f"{cache_file}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.report_cache_dir, exist_ok=True)
+            self._prune_report_cache()
+            with open(tmp_file, 'wb') as f:
+                f.write(buf.getbuffer())
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning(f"写入报表缓存失败: {e}")
+        buf.seek(0)
+        return buf
+
+    def _prune_report_cache(self):
+        """清理已过期的报表缓存文件（每个实例只执行一次）"""
+        if self._report_cache_pruned:
+            return
+        self._report_cache_pruned = True
+        expire_before = time.time() - REPORT_CACHE_TTL
+        for entry in os.scandir(self.report_cache_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < expire_before:
+                    os.remove(entry.path)
+            except OSError:
+                pass
 
-            data = result.get('data', {})
-            if not data:
-                return
+    def _request_account_data(self) -> dict:
+        """从平台API获取账户数据（cookie/mtgsig/stores_json/brands_json/compareRegions_json）
+
+        Returns:
+            API返回的data字段
+
+        Raises:
+            Exception: API调用失败或返回数据为空
+        """
+        headers = {'Content-Type': 'application/json'}
+        data = json_dumps_bytes({"account": self.account_name})
+
+        session = self._get_session()
+        response = session.post(self.platform_api_url, headers=headers, data=data, timeout=30)
+        response.raise_for_status()
+        result = json_loads(response.content)
+
+        if not result or not result.get('success'):
+            raise Exception(f"API返回失败")
+
+        data = result.get('data', {})
+        if not data:
+            raise Exception(f"API返回的data为空")
+
+        return data
+
+    def _fetch_additional_info_from_api(self):
+        """从API补充获取额外信息（门店列表、团购映射、商圈信息）"""
+        try:
+            data = self._request_account_data()
 
             self.cookie_data = data
 
@@ -4800,8 +5179,9 @@ class DianpingStoreStats:
             if stores_json:
                 self.shop_list = stores_json
                 print(f"✅ 成功加载 {len(self.shop_list)} 个门店")
-                for shop in self.shop_list:
-                    print(f"   - {shop.get('shop_name')} ({shop.get('shop_id')})")
+                if logger.isEnabledFor(logging.DEBUG):
+                    for shop in self.shop_list:
+                        logger.debug("   - %s (%s)", shop.get('shop_name'), shop.get('shop_id'))
 
             # 获取团购ID映射
             brands_json = data.get('brands_json', [])
@@ -4815,6 +5195,8 @@ class DianpingStoreStats:
                 self.shop_region_info = compare_regions
                 print(f"✅ 成功加载 {len(self.shop_region_info)} 个门店商圈信息")
 
+            self._index_shops()
+
         except Exception as e:
             print(f"⚠️ 补充获取信息失败: {e}")
 
@@ -4827,37 +5209,17 @@ class DianpingStoreStats:
         try:
             print(f"\n📡 正在从大众点评获取门店列表...")
             url = "https://e.dianping.com/gateway/merchant/general/shopinfo"
-            params = {
-                'yodaReady': 'h5',
-                'csecplatform': '4',
-                'csecversion': '4.1.1'
-            }
-            payload = {
-                "bizType": "pc-shouye",
-                "device": "pc",
-                "currentTab": "city",
-                "shopIds": "0"
-            }
-            headers = {
-                'Accept': 'application/json, text/plain, */*',
-                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                'Connection': 'keep-alive',
-                'Content-Type': 'application/json',
-                'Referer': 'https://e.dianping.com/codejoy/2703/home/index.html',
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
 
             session = self._get_session()
             response = session.post(
                 url,
-                params=params,
-                headers=headers,
-                cookies=self.cookies,
-                json=payload,
+                params=self._CSEC_PARAMS,
+                headers=self._ADVISER_JSON_HEADERS,
+                data=self._SHOP_INFO_BODY,
                 timeout=30
             )
             response.raise_for_status()
-            data = response.json()
+            data = json_loads(response.content)
 
             if data.get('code') == 200 and data.get('data') and data['data'].get('shopInfoList'):
                 shop_list = []
@@ -4883,9 +5245,98 @@ class DianpingStoreStats:
             print(f"⚠️ 获取门店列表失败: {e}")
             return []
 
+    def _wait_region_rate_limit(self):
+        """商圈接口限速：多线程共享，保证相邻两次请求间隔不小于 REGION_FETCH_MIN_INTERVAL"""
+        with self._region_rate_lock:
+            now = time.monotonic()
+            wait = self._region_next_request_at - now
+            self._region_next_request_at = max(now, self._region_next_request_at) + REGION_FETCH_MIN_INTERVAL
+        if wait > 0:
+            time.sleep(wait)
+
+    def _wait_dianping_rate_limit(self):
+        """点评数据接口限速（令牌桶）：多线程共享，平均每秒不超过 DIANPING_REQUEST_RATE 次，
+        允许 DIANPING_REQUEST_BURST 次突发；每次请求另加少量随机抖动"""
+        with self._dianping_rate_lock:
+            now = time.monotonic()
+            self._dianping_tokens = min(float(DIANPING_REQUEST_BURST),
+                                        self._dianping_tokens + (now - self._dianping_tokens_at) * DIANPING_REQUEST_RATE)
+            self._dianping_tokens_at = now
+            self._dianping_tokens -= 1
+            wait = -self._dianping_tokens / DIANPING_REQUEST_RATE if self._dianping_tokens < 0 else 0.0
+        time.sleep(wait + random.uniform(0, DIANPING_REQUEST_JITTER))
+
+    def _fetch_one_shop_region(self, shop: dict, index: int, total: int) -> Optional[dict]:
+        """获取单个门店的商圈数据
+
+        Args:
+            shop: 门店信息（需包含 shop_id）
+            index: 门店序号（从0开始，仅用于日志）
+            total: 门店总数（仅用于日志）
+
+        Returns:
+            compareRegions_json 中该门店对应的数据，失败返回None
+        """
+        shop_id = shop['shop_id']
+        shop_name = shop.get('shopName', shop.get('shop_name', ''))
+
+        self._wait_region_rate_limit()
+        # 并发线程中避免 print 抢占 stdout，逐门店进度仅在 DEBUG 级别输出
+        logger.debug("[%d/%d] 正在获取门店 %s (ID: %s) 的商圈数据...", index + 1, total, shop_name, shop_id)
+
+        try:
+            url = "https://e.dianping.com/gateway/adviser/complexfilter"
+            params = {
+                **self._REGION_BASE_PARAMS,
+                'shopIds': shop_id,
+                'mtgsig': self._generate_mtgsig() if hasattr(self, '_generate_mtgsig') else ''
+            }
+
+            session = self._get_session()
+            response = session.get(
+                url,
+                params=params,
+                headers=self._ADVISER_HEADERS,
+                timeout=30
+            )
+            response.raise_for_status()
+            data = json_loads(response.content)
+
+            if data.get('success') and data.get('data') and data['data'].get('compareRegions'):
+                regions = data['data']['compareRegions'].get('content', [])
+
+                # 解析商圈数据（三个层级都取到后立即停止遍历）
+                regions_dict = {}
+                type_keys = self._REGION_TYPE_KEYS
+                for region in regions:
+                    key = type_keys.get(region.get('type', ''))
+                    if key is None:
+                        continue
+                    regions_dict[key] = {
+                        'regionId': region.get('regionId'),
+                        'regionName': region.get('regionName')
+                    }
+                    if len(regions_dict) == len(type_keys):
+                        break
+
+                logger.debug("门店 %s 商圈获取成功: %s", shop_id, regions_dict)
+                return {
+                    'shopName': shop.get('shopName', ''),
+                    'branchName': shop.get('branchName'),
+                    'cityId': shop.get('cityId'),
+                    'regions': regions_dict
+                }
+            else:
+                logger.warning("门店 %s 商圈获取失败: %s", shop_id, data.get('msg', '返回数据格式错误'))
+
+        except Exception as e:
+            logger.warning("门店 %s 商圈获取失败: %s", shop_id, e)
+
+        return None
+
     def _fetch_shop_regions_from_dianping(self, shop_list: list) -> dict:
         """
-        从大众点评API获取所有门店的商圈数据
+        从大众点评API获取所有门店的商圈数据（多线程并发，按 REGION_FETCH_MIN_INTERVAL 限速）
         API: GET https://e.dianping.com/gateway/adviser/complexfilter
         返回: compareRegions_json 格式的商圈数据
         """
@@ -4894,84 +5345,18 @@ class DianpingStoreStats:
 
         print(f"\n📡 开始获取 {len(shop_list)} 个门店的商圈数据...")
         compare_regions_data = {}
+        total = len(shop_list)
 
-        for i, shop in enumerate(shop_list):
-            shop_id = shop['shop_id']
-            shop_name = shop.get('shopName', shop.get('shop_name', ''))
-
-            print(f"   [{i + 1}/{len(shop_list)}] 正在获取门店 {shop_name} (ID: {shop_id}) 的商圈数据...")
-
-            try:
-                url = "https://e.dianping.com/gateway/adviser/complexfilter"
-                params = {
-                    'device': 'pc',
-                    'source': '1',
-                    'pageType': 'compareRegions',
-                    'sign': '',
-                    'shopIds': shop_id,
-                    'yodaReady': 'h5',
-                    'csecplatform': '4',
-                    'csecversion': '4.1.1',
-                    'mtgsig': self._generate_mtgsig() if hasattr(self, '_generate_mtgsig') else ''
-                }
-                headers = {
-                    'Accept': 'application/json, text/plain, */*',
-                    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                    'Connection': 'keep-alive',
-                    'Referer': 'https://e.dianping.com/codejoy/2703/home/index.html',
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-
-                session = self._get_session()
-                response = session.get(
-                    url,
-                    params=params,
-                    headers=headers,
-                    cookies=self.cookies,
-                    timeout=30
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                if data.get('success') and data.get('data') and data['data'].get('compareRegions'):
-                    regions = data['data']['compareRegions'].get('content', [])
-
-                    # 解析商圈数据
-                    regions_dict = {}
-                    for region in regions:
-                        region_type = region.get('type', '')
-                        if region_type == '城市':
-                            regions_dict['city'] = {
-                                'regionId': region.get('regionId'),
-                                'regionName': region.get('regionName')
-                            }
-                        elif region_type == '行政区':
-                            regions_dict['district'] = {
-                                'regionId': region.get('regionId'),
-                                'regionName': region.get('regionName')
-                            }
-                        elif region_type == '商圈':
-                            regions_dict['business'] = {
-                                'regionId': region.get('regionId'),
-                                'regionName': region.get('regionName')
-                            }
-
-                    compare_regions_data[shop_id] = {
-                        'shopName': shop.get('shopName', ''),
-                        'branchName': shop.get('branchName'),
-                        'cityId': shop.get('cityId'),
-                        'regions': regions_dict
-                    }
-                    print(f"      ✅ 成功: {regions_dict}")
-                else:
-                    print(f"      ⚠️ 失败: {data.get('msg', '返回数据格式错误')}")
-
-            except Exception as e:
-                print(f"      ⚠️ 失败: {e}")
-
-            # 间隔延迟，避免请求过快
-            if i < len(shop_list) - 1:
-                time.sleep(2)
+        with ThreadPoolExecutor(max_workers=min(REGION_FETCH_MAX_WORKERS, total)) as executor:
+            futures = {
+                executor.submit(self._fetch_one_shop_region, shop, i, total): shop['shop_id']
+                for i, shop in enumerate(shop_list)
+            }
+            # 按门店原始顺序收集结果，保证回传数据顺序稳定
+            for future, shop_id in futures.items():
+                region_data = future.result()
+                if region_data:
+                    compare_regions_data[shop_id] = region_data
 
         print(f"\n✅ 商圈数据获取完成，成功 {len(compare_regions_data)}/{len(shop_list)} 个")
         return compare_regions_data
@@ -4986,20 +5371,20 @@ class DianpingStoreStats:
 
             payload = {
                 "account": self.account_name,
-                "stores_json": json.dumps(stores_json, ensure_ascii=False),
-                "compareRegions_json": json.dumps(compare_regions_json, ensure_ascii=False)
+                "stores_json": json_dumps_bytes(stores_json).decode('utf-8'),
+                "compareRegions_json": json_dumps_bytes(compare_regions_json).decode('utf-8')
             }
 
             session = self._get_session()
             response = session.post(
                 POST_STORES_REGIONS_API_URL,
                 headers={'Content-Type': 'application/json'},
-                json=payload,
+                data=json_dumps_bytes(payload),
                 timeout=30
             )
 
             if response.status_code == 200:
-                result = response.json()
+                result = json_loads(response.content)
                 if result.get('success'):
                     print(f"✅ 门店和商圈数据回传成功")
                     return True
@@ -5020,14 +5405,13 @@ class DianpingStoreStats:
         触发条件: stores_json 为空 OR compareRegions_json 为空
         此任务失败不影响主流程，不记录失败日志
         """
-        try:
-            # 检查是否需要补全
-            stores_empty = not self.shop_list or len(self.shop_list) == 0
-            regions_empty = not self.shop_region_info or len(self.shop_region_info) == 0
+        # 数据完整，无需补全（快速返回，不构造任何日志）
+        if self.shop_list and self.shop_region_info:
+            return
 
-            if not stores_empty and not regions_empty:
-                # 数据完整，无需补全
-                return
+        try:
+            stores_empty = not self.shop_list
+            regions_empty = not self.shop_region_info
 
             print(f"\n🔄 检测到门店/商圈数据不完整，开始自动补全...")
             print(f"   门店数据: {'为空' if stores_empty else f'{len(self.shop_list)} 个'}")
@@ -5047,10 +5431,11 @@ class DianpingStoreStats:
                 # 门店数据不为空，用于获取商圈
                 fetched_shops = []
                 for shop in self.shop_list:
+                    name = shop.get('shop_name', '')
                     fetched_shops.append({
                         'shop_id': shop.get('shop_id', ''),
-                        'shop_name': shop.get('shop_name', ''),
-                        'shopName': shop.get('shop_name', '').split('店')[0] if '店' in shop.get('shop_name', '') else shop.get('shop_name', ''),
+                        'shop_name': name,
+                        'shopName': name.split('店')[0],
                         'branchName': None,
                         'cityId': None
                     })
@@ -5078,6 +5463,7 @@ class DianpingStoreStats:
     def _install_browser(self):
         """自动安装Playwright浏览器"""
         print("\n⚠️ 检测到Chromium浏览器未安装，正在自动下载...")
+        import subprocess  # 仅在首次安装浏览器时用到，按需导入
         try:
             process = subprocess.Popen(
                 [sys.executable, '-m', 'playwright', 'install', 'chromium'],
@@ -5125,15 +5511,22 @@ class DianpingStoreStats:
                     self.page.wait_for_load_state('networkidle', timeout=5000)
                 except Exception:
                     pass
-                time.sleep(2)
+                # 等待页面内容渲染（或已跳转到登录页），条件满足立即返回，替代固定 sleep(2)
+                try:
+                    self.page.wait_for_function(
+                        "() => location.href.toLowerCase().includes('login') || "
+                        "(document.readyState === 'complete' && !!document.body && document.body.textContent.length > 100)",
+                        timeout=7000
+                    )
+                except Exception:
+                    pass
 
-                current_url = self.page.url
-                if 'login' in current_url.lower():
-                    logger.warning("检测到登录页面URL，账户登录状态已失效")
+                probe = self.page.evaluate(self._LOGIN_PROBE_JS)
+                if 'login' in probe['url'].lower() or probe['hasLoginForm']:
+                    logger.warning("检测到登录页面，账户登录状态已失效")
                     return False, "not_logged_in"
 
-                has_content = self.page.evaluate("() => document.body.textContent.length > 100")
-                if has_content:
+                if probe['textLen'] > 100:
                     return True, "logged_in"
                 else:
                     logger.warning("页面内容为空，可能未正确加载")
@@ -5174,32 +5567,15 @@ class DianpingStoreStats:
             raise Exception("Playwright未安装，无法启动浏览器")
 
         print("\n🌐 启动浏览器")
-        self.playwright = sync_playwright().start()
-
-        max_retries = 2
-        for attempt in range(max_retries):
-            try:
-                self.browser = self.playwright.chromium.launch(headless=self.headless, proxy=None)
-                break
-            except Exception as e:
-                if "Executable doesn't exist" in str(e) and attempt == 0:
-                    if self._install_browser():
-                        continue
-                    else:
-                        raise Exception("浏览器安装失败")
-                raise e
+        # 浏览器进程在进程内共享，本账号只创建独立的Context（Cookie互不影响）
+        self.browser = get_store_stats_browser(self.headless, install_browser=self._install_browser)
 
         use_saved_state = os.path.exists(self.state_file)
 
         if use_saved_state:
             print(f"✓ 检测到状态文件: {self.state_file}")
             try:
-                self.context = self.browser.new_context(
-                    storage_state=self.state_file,
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                    proxy=None, bypass_csp=True, ignore_https_errors=True
-                )
+                self.context = new_store_stats_context(self.browser, storage_state=self.state_file)
                 self.page = self.context.new_page()
                 is_logged_in, status = self._check_login_status()
                 if is_logged_in:
@@ -5216,13 +5592,7 @@ class DianpingStoreStats:
 
         if not use_saved_state:
             print("正在使用Cookie登录...")
-            playwright_cookies = self._convert_cookies_to_playwright_format(self.cookies)
-            self.context = self.browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                proxy=None, bypass_csp=True, ignore_https_errors=True
-            )
-            self.context.add_cookies(playwright_cookies)
+            self.context = new_store_stats_context(self.browser, cookies=self._playwright_cookies)
             self.page = self.context.new_page()
 
             is_logged_in, status = self._check_login_status()
@@ -5248,13 +5618,12 @@ class DianpingStoreStats:
             print("✓ 外部浏览器页面保持打开（由外部管理）")
             return
 
+        # 只关闭本账号的Context，共享浏览器保留给后续账号复用
         if self.context:
             self.context.close()
-        if self.browser:
-            self.browser.close()
-        if self.playwright:
-            self.playwright.stop()
-        print("✓ 浏览器已关闭")
+            self.context = None
+        self.page = None
+        print("✓ 浏览器Context已关闭")
 
     def _get_mtgsig(self) -> str:
         """获取mtgsig"""
@@ -5266,17 +5635,9 @@ class DianpingStoreStats:
         mtgsig = {"a1": "1.2", "a2": timestamp, "a3": a3, "a5": "", "a6": "", "a8": "", "a9": "4.1.1,7,139", "a10": "9a", "x0": 4, "d1": ""}
         return json.dumps(mtgsig)
 
-    def _get_headers(self) -> Dict[str, str]:
-        """获取通用请求头"""
-        return {
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'zh-CN,zh;q=0.9',
-            'Connection': 'keep-alive',
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'Origin': 'https://h5.dianping.com',
-            'Referer': 'https://h5.dianping.com/',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+    def _get_headers(self) -> Mapping[str, str]:
+        """获取通用请求头（只读，调用方不得修改）"""
+        return self._H5_FORM_HEADERS
 
     def _calculate_flow_date_range(self) -> str:
         """计算客流数据的日期范围"""
@@ -5322,6 +5683,12 @@ class DianpingStoreStats:
             logger.warning(f"未找到页面URL: {page_key}")
             return True
 
+        # 已停留在目标页面（如阶段重试）时不再重新加载整个页面
+        current_url = (self.page.url or '').split('#')[0].rstrip('/')
+        if current_url == page_url.split('#')[0].rstrip('/'):
+            logger.debug(f"已在 [{page_name}]，跳过页面跳转")
+            return True
+
         return navigate_to_url(self.page, page_url, page_name)
 
     def get_force_offline_data(self, target_date: str) -> Dict[str, int]:
@@ -5343,52 +5710,38 @@ class DianpingStoreStats:
             current_url = self.page.url.lower()
             if 'login' in current_url or 'passport' in current_url:
                 print(f"🚨 检测到页面被重定向到登录页，Cookie已失效")
-                self.login_invalid = True
-                self.login_invalid_error = "获取强制下线数据时检测到Cookie失效（重定向到登录页）"
+                self._mark_login_invalid("获取强制下线数据时检测到Cookie失效（重定向到登录页）")
                 return force_offline_count
 
             api_url = "https://e.dianping.com/gateway/msg/MessageDzService/queryPcMessageList"
             target_date_obj = datetime.strptime(target_date, '%Y-%m-%d').date()
 
-            script = f"""
-            async () => {{
-                try {{
-                    const response = await fetch('{api_url}?yodaReady=h5&csecplatform=4&csecversion=4.1.1', {{
-                        method: 'POST', credentials: 'include',
-                        headers: {{'Content-Type': 'application/json'}},
-                        body: JSON.stringify({{"messageCategoryCode": 0, "status": null, "subCategoryIdList": null, "important": 1, "pageNo": 1, "pageSize": 100}})
-                    }});
-                    const status = response.status;
-                    const data = await response.json();
-                    return {{success: true, status: status, data: data}};
-                }} catch(e) {{
-                    return {{success: false, error: e.message}};
-                }}
-            }}
-            """
-
-            result = self.page.evaluate(script)
-            if not result.get('success'):
-                print(f"❌ API调用失败: {result.get('error')}")
-                return force_offline_count
+            # 页面跳转只用于预热登录态/检测重定向，接口直接由共享Session请求（Cookie已挂在Session上）
+            self._wait_dianping_rate_limit()
+            response = self._get_session().post(
+                api_url,
+                params=self._CSEC_PARAMS,
+                headers=self._NOTICE_CENTER_HEADERS,
+                data=json_dumps_bytes({"messageCategoryCode": 0, "status": None, "subCategoryIdList": None,
+                                       "important": 1, "pageNo": 1, "pageSize": 100}),
+                timeout=30
+            )
 
             # 检查HTTP状态码是否是登录失效
-            http_status = result.get('status', 200)
-            if http_status == 401:
+            if response.status_code == 401:
                 print(f"🚨 检测到HTTP 401，Cookie已失效")
-                self.login_invalid = True
-                self.login_invalid_error = "获取强制下线数据时检测到Cookie失效（HTTP 401）"
+                self._mark_login_invalid("获取强制下线数据时检测到Cookie失效（HTTP 401）")
                 return force_offline_count
 
-            api_result = result.get('data', {})
+            response.raise_for_status()
+            api_result = json_loads(response.content)
             api_status = api_result.get('status')
             api_msg = api_result.get('msg', '')
 
             # 检查API返回是否是登录失效
             if is_auth_invalid_error(api_status, api_msg):
                 print(f"🚨 检测到登录失效: status={api_status}, msg={api_msg}")
-                self.login_invalid = True
-                self.login_invalid_error = f"获取强制下线数据时检测到Cookie失效（API返回: status={api_status}, msg={api_msg}）"
+                self._mark_login_invalid(f"获取强制下线数据时检测到Cookie失效（API返回: status={api_status}, msg={api_msg}）")
                 return force_offline_count
 
             if api_status != 0:
@@ -5398,20 +5751,19 @@ class DianpingStoreStats:
             message_list = api_result.get('messageList', [])
             print(f"   获取到 {len(message_list)} 条消息")
 
-            for msg in message_list:
-                title = msg.get('title', '')
-                create_time = msg.get('createTime', 0)
-                if '强制下线' not in title:
-                    continue
-                if create_time:
-                    msg_date = datetime.fromtimestamp(create_time / 1000).date()
-                    if msg_date != target_date_obj:
-                        continue
-                    shop_id = msg.get('mtShopId') or self.shop_id
-                    if shop_id:
-                        shop_id_str = str(shop_id)
-                        force_offline_count[shop_id_str] = force_offline_count.get(shop_id_str, 0) + 1
-                        print(f"   📌 发现强制下线: 门店{shop_id_str}")
+            # 目标日期（本地时区）的毫秒时间戳区间，直接与 createTime 比较，无需逐条转换日期
+            day_start = int(datetime.combine(target_date_obj, datetime.min.time()).timestamp() * 1000)
+            day_end = int(datetime.combine(target_date_obj + timedelta(days=1), datetime.min.time()).timestamp() * 1000)
+            hits = Counter(
+                str(msg.get('mtShopId') or self.shop_id)
+                for msg in message_list
+                if '强制下线' in msg.get('title', '')
+                and day_start <= (msg.get('createTime') or 0) < day_end
+                and (msg.get('mtShopId') or self.shop_id)
+            )
+            force_offline_count = dict(hits)
+            for shop_id_str, count in force_offline_count.items():
+                print(f"   📌 发现强制下线: 门店{shop_id_str} × {count}")
 
             print(f"✅ 强制下线统计完成: {force_offline_count}")
             return force_offline_count
@@ -5438,9 +5790,10 @@ class DianpingStoreStats:
 
         try:
             session = self._get_session()
-            response = session.post(url, params=params, data=post_data, headers=self._get_headers(), cookies=self.cookies, timeout=60)
+            self._wait_dianping_rate_limit()
+            response = session.post(url, params=params, data=post_data, headers=self._get_headers(), timeout=60)
             response.raise_for_status()
-            result = response.json()
+            result = json_loads(response.content)
 
             if result.get('code') != 200:
                 print(f"❌ API返回错误")
@@ -5460,23 +5813,20 @@ class DianpingStoreStats:
 
             random_delay()  # 反爬虫等待
             print(f"   📥 下载文件...")
-            file_response = session.get(file_url, timeout=60)
-            df = pd.read_excel(BytesIO(file_response.content))
+            file_buf = self._download_report(file_url, f"flowDataSummaryDownloadPCAsync_{date_range}")
+            df = read_excel_bytes(file_buf, usecols=list(self._FLOW_REPORT_COLUMNS))
             print(f"   📊 读取到 {len(df)} 行数据")
 
-            date_col = df.columns[0]
+            date_col, shop_id_col, checkin_col = df.columns  # A列日期 / D列门店ID / AM列打卡数
             df[date_col] = pd.to_datetime(df[date_col])
             latest_date = df[date_col].max()
             latest_df = df[df[date_col] == latest_date]
 
-            shop_id_col = df.columns[3]
-            checkin_col = df.columns[36]  # AM列 - 第37列 - 打卡数
-
-            for _, row in latest_df.iterrows():
-                shop_id = str(int(row[shop_id_col])) if pd.notna(row[shop_id_col]) else None
-                checkin_count = int(row[checkin_col]) if pd.notna(row[checkin_col]) else 0
-                if shop_id:
-                    checkin_data[shop_id] = checkin_count
+            # 整列转换后一次性组装，替代逐行 iterrows
+            shop_ids = id_column_to_str(latest_df[shop_id_col])
+            checkin_counts = pd.to_numeric(latest_df[checkin_col], errors='coerce').fillna(0).astype(int)
+            valid = shop_ids.notna()
+            checkin_data.update(zip(shop_ids[valid].tolist(), checkin_counts[valid].tolist()))
 
             print(f"✅ 客流数据获取完成: {len(checkin_data)} 个门店")
             return checkin_data
@@ -5500,23 +5850,27 @@ class DianpingStoreStats:
                 rank_data[shop['shop_id']] = {'order_user_rank': 0, 'verify_amount_rank': 0}
             return rank_data
 
-        for shop in self.shop_list:
-            shop_id = shop['shop_id']
-            shop_name = shop['shop_name']
-            shop_info = self.shop_region_info.get(shop_id, {})
-            regions = shop_info.get('regions', {})
-            business = regions.get('business', {})
-            region_id = business.get('regionId')
-
-            if not region_id:
-                rank_data[shop_id] = {'order_user_rank': 0, 'verify_amount_rank': 0}
-                continue
-
+        def fetch_rank(shop_id: str, shop_name: str, region_id) -> Dict[str, int]:
             print(f"   🏪 获取门店 {shop_name}({shop_id}) 的排名数据...")
             shop_rank = self._get_rival_rank_by_shop(shop_id, region_id)
-            rank_data[shop_id] = shop_rank
-            print(f"      下单排名: {shop_rank['order_user_rank']}, 核销排名: {shop_rank['verify_amount_rank']}")
-            random_delay()  # 反爬虫等待
+            print(f"      {shop_name} 下单排名: {shop_rank['order_user_rank']}, 核销排名: {shop_rank['verify_amount_rank']}")
+            random_delay()  # 反爬虫等待（每个线程各自等待）
+            return shop_rank
+
+        # 各门店的排名请求互不依赖，并发执行；结果按门店原始顺序收集
+        futures = {}
+        with ThreadPoolExecutor(max_workers=RIVAL_RANK_MAX_WORKERS) as executor:
+            for shop in self.shop_list:
+                shop_id = shop['shop_id']
+                region_id = self._shop_region_id.get(shop_id)
+
+                if not region_id:
+                    rank_data[shop_id] = {'order_user_rank': 0, 'verify_amount_rank': 0}
+                    continue
+                futures[shop_id] = executor.submit(fetch_rank, shop_id, shop['shop_name'], region_id)
+
+            for shop_id, future in futures.items():
+                rank_data[shop_id] = future.result()
 
         print(f"✅ 同行排名数据获取完成: {len(rank_data)} 个门店")
         return rank_data
@@ -5537,9 +5891,10 @@ class DianpingStoreStats:
 
         try:
             session = self._get_session()
-            response = session.get(url, params=params, headers=headers, cookies=self.cookies, timeout=60)
+            self._wait_dianping_rate_limit()
+            response = session.get(url, params=params, headers=headers, timeout=60)
             response.raise_for_status()
-            result = response.json()
+            result = json_loads(response.content)
 
             if result.get('code') != 200:
                 return default_result
@@ -5555,24 +5910,22 @@ class DianpingStoreStats:
             if not file_url:
                 return default_result
 
-            file_response = session.get(file_url, timeout=60)
-            df = pd.read_excel(BytesIO(file_response.content))
+            file_buf = self._download_report(file_url, f"shopRankListDownload_latest_{datetime.now():%Y-%m-%d}_{shop_id}_{region_id}")
+            df = read_excel_bytes(file_buf, usecols=list(self._RANK_REPORT_COLUMNS))
 
             if len(df) == 0:
                 return default_result
 
-            shop_id_col = df.columns[4]
-            order_rank_col = df.columns[10]
-            verify_rank_col = df.columns[14]
+            shop_id_col, order_rank_col, verify_rank_col = df.columns
 
-            for _, row in df.iterrows():
-                row_shop_id = str(int(row[shop_id_col])) if pd.notna(row[shop_id_col]) else None
-                if row_shop_id == shop_id:
-                    return {
-                        'order_user_rank': self._parse_rank_value(row[order_rank_col]),
-                        'verify_amount_rank': self._parse_rank_value(row[verify_rank_col])
-                    }
-            return default_result
+            matched = df[id_column_to_str(df[shop_id_col]) == shop_id]
+            if matched.empty:
+                return default_result
+            row = matched.iloc[0]
+            return {
+                'order_user_rank': self._parse_rank_value(row[order_rank_col]),
+                'verify_amount_rank': self._parse_rank_value(row[verify_rank_col])
+            }
         except Exception as e:
             print(f"      ❌ 获取排名数据失败: {e}")
             return default_result
@@ -5593,7 +5946,7 @@ class DianpingStoreStats:
             print("⚠️ 没有团购ID映射，跳过广告单数据获取")
             return ad_data
 
-        shop_to_brands = {item['shop_id']: item['brands_id'] for item in self.product_mapping}
+        shop_to_brands = self._shop_to_brand
         url = "https://e.dianping.com/gateway/adviser/data"
         yesterday = self._get_yesterday_date()
         timestamp = int(time.time() * 1000)
@@ -5610,9 +5963,10 @@ class DianpingStoreStats:
 
         try:
             session = self._get_session()
-            response = session.post(url, params=params, data=post_data, headers=self._get_headers(), cookies=self.cookies, timeout=60)
+            self._wait_dianping_rate_limit()
+            response = session.post(url, params=params, data=post_data, headers=self._get_headers(), timeout=60)
             response.raise_for_status()
-            result = response.json()
+            result = json_loads(response.content)
 
             if result.get('code') != 200:
                 return ad_data
@@ -5630,23 +5984,23 @@ class DianpingStoreStats:
 
             random_delay()  # 反爬虫等待
             print(f"   📥 下载文件...")
-            file_response = session.get(file_url, timeout=60)
-            df = pd.read_excel(BytesIO(file_response.content))
+            file_buf = self._download_report(file_url, f"shopTradeProductRankDownload_{yesterday}_{self.shop_id}")
+            df = read_excel_bytes(file_buf, usecols=list(self._TRADE_REPORT_COLUMNS))
             print(f"   📊 读取到 {len(df)} 行数据")
 
-            product_id_col = df.columns[2]
-            shop_id_col = df.columns[6]
-            order_count_col = df.columns[8]
+            product_id_col, shop_id_col, order_count_col = df.columns
 
-            for _, row in df.iterrows():
-                product_id = str(int(row[product_id_col])) if pd.notna(row[product_id_col]) else None
-                row_shop_id = str(int(row[shop_id_col])) if pd.notna(row[shop_id_col]) else None
-                order_count = int(row[order_count_col]) if pd.notna(row[order_count_col]) else 0
+            # 先按整列筛出属于本账户门店的行，只对少量命中行做逐行比对
+            row_shop_ids = id_column_to_str(df[shop_id_col])
+            in_account = row_shop_ids.isin(list(shop_to_brands.keys()))
+            product_ids = id_column_to_str(df.loc[in_account, product_id_col])
+            order_counts = pd.to_numeric(df.loc[in_account, order_count_col], errors='coerce').fillna(0).astype(int)
 
-                if row_shop_id and row_shop_id in shop_to_brands:
-                    if product_id == shop_to_brands[row_shop_id]:
-                        ad_data[row_shop_id] = order_count
-                        print(f"   📌 找到: 门店ID={row_shop_id}, 下单人数={order_count}")
+            for row_shop_id, product_id, order_count in zip(row_shop_ids[in_account].tolist(),
+                                                            product_ids.tolist(), order_counts.tolist()):
+                if product_id == shop_to_brands[row_shop_id]:
+                    ad_data[row_shop_id] = order_count
+                    print(f"   📌 找到: 门店ID={row_shop_id}, 下单人数={order_count}")
 
             print(f"✅ 商品交易数据获取完成")
             return ad_data
@@ -5663,6 +6017,12 @@ class DianpingStoreStats:
         """
         print("\n💰 获取财务余额数据")
 
+        with _finance_balance_cache_lock:
+            cached = _finance_balance_cache.get(self.account_name)
+        if cached and time.time() - cached[0] < FINANCE_BALANCE_CACHE_TTL:
+            print(f"📌 使用财务余额缓存（{FINANCE_BALANCE_CACHE_TTL}秒内有效）: {cached[1]:.2f} 元")
+            return cached[1]
+
         url = "https://e.dianping.com/adpaccount/finance/account/r/getHomeFinancialDetail"
 
         headers = {
@@ -5683,30 +6043,28 @@ class DianpingStoreStats:
 
         try:
             session = self._get_session()
+            self._wait_dianping_rate_limit()
             response = session.get(
                 url,
                 headers=headers,
-                cookies=self.cookies,
                 timeout=30
             )
 
             # 检查HTTP状态码是否是登录失效
             if response.status_code == 401:
                 print(f"🚨 检测到HTTP 401，Cookie已失效")
-                self.login_invalid = True
-                self.login_invalid_error = "获取财务余额时检测到Cookie失效（HTTP 401）"
+                self._mark_login_invalid("获取财务余额时检测到Cookie失效（HTTP 401）")
                 return 0.0
 
             response.raise_for_status()
-            result = response.json()
+            result = json_loads(response.content)
 
             # 检查API返回是否是登录失效
             api_code = result.get('code')
             api_msg = result.get('msg', '')
             if is_auth_invalid_error(api_code, api_msg):
                 print(f"🚨 检测到登录失效: code={api_code}, msg={api_msg}")
-                self.login_invalid = True
-                self.login_invalid_error = f"获取财务余额时检测到Cookie失效（API返回: code={api_code}, msg={api_msg}）"
+                self._mark_login_invalid(f"获取财务余额时检测到Cookie失效（API返回: code={api_code}, msg={api_msg}）")
                 return 0.0
 
             if api_code != 0:
@@ -5729,6 +6087,7 @@ class DianpingStoreStats:
                     balance = float(balance) if balance else 0.0
                     print(f"✅ 财务余额获取成功")
                     print(f"   综合推广余额: {balance:.2f} 元")
+                    self._cache_finance_balance(balance)
                     return balance
 
             # 如果没找到"综合推广"，返回第一个产品的余额
@@ -5742,16 +6101,21 @@ class DianpingStoreStats:
                 product_name = first_item.get('productName', '未知')
                 print(f"⚠️ 未找到'综合推广'，使用'{product_name}'的余额")
                 print(f"   余额: {balance:.2f} 元")
+                self._cache_finance_balance(balance)
                 return balance
 
             return 0.0
 
         except Exception as e:
             print(f"❌ 获取财务余额失败: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.debug("获取财务余额异常详情", exc_info=True)
             return 0.0
 
+    def _cache_finance_balance(self, balance: float):
+        """缓存成功获取的财务余额（失败/登录失效时返回的0不缓存）"""
+        with _finance_balance_cache_lock:
+            _finance_balance_cache[self.account_name] = (time.time(), balance)
+
     def collect_and_upload(self, target_date: str, upload_api_url: str) -> bool:
         """收集所有数据并上传
 
@@ -5762,38 +6126,39 @@ class DianpingStoreStats:
         print(f"   目标日期: {target_date}")
         print(f"   门店数量: {len(self.shop_list)}")
 
+        # 财务余额只走HTTP接口、不依赖浏览器页面，与页面采集并发执行
+        finance_executor = ThreadPoolExecutor(max_workers=1)
         try:
+            finance_future = finance_executor.submit(self.get_finance_balance)
+
             self.start_browser()
 
             # 获取强制下线数据
             force_offline_data = self.get_force_offline_data(target_date)
             if self.login_invalid:
                 raise AuthInvalidError(self.login_invalid_error)
-            random_delay()  # 反爬虫等待
-
-            # 获取财务余额数据
-            finance_balance = self.get_finance_balance()
-            if self.login_invalid:
-                raise AuthInvalidError(self.login_invalid_error)
-            random_delay()  # 反爬虫等待
 
             # 获取客流数据
             checkin_data = self.get_flow_data()
             if self.login_invalid:
                 raise AuthInvalidError(self.login_invalid_error)
-            random_delay()  # 反爬虫等待
 
             # 获取同行排名数据
             rank_data = self.get_rival_rank_data()
             if self.login_invalid:
                 raise AuthInvalidError(self.login_invalid_error)
-            random_delay()  # 反爬虫等待
 
             # 获取广告单数据
             ad_data = self.get_trade_data()
             if self.login_invalid:
                 raise AuthInvalidError(self.login_invalid_error)
+
+            # 获取财务余额数据（已在后台并发获取）
+            finance_balance = finance_future.result()
+            if self.login_invalid:
+                raise AuthInvalidError(self.login_invalid_error)
         finally:
+            finance_executor.shutdown(wait=True)
             self.stop_browser()
 
         # 更新共享签名
@@ -5830,21 +6195,30 @@ class DianpingStoreStats:
         session = self._get_session()
         success_count = 0
         fail_count = 0
-
-        for idx, data in enumerate(upload_data_list, 1):
-            try:
-                response = session.post(upload_api_url, json=data, headers={'Content-Type': 'application/json'}, timeout=API_TIMEOUT)
-                if response.status_code in [200, 201]:
-                    success_count += 1
-                    print(f"   [{idx}/{len(upload_data_list)}] ✅ 成功 - {data['store_name']}")
-                else:
+        total = len(upload_data_list)
+
+        # 并发上传：各门店互不依赖，共用 session 的连接池；计数只在主线程中更新
+        with ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(session.post, upload_api_url, data=json_dumps_bytes(data),
+                                headers={'Content-Type': 'application/json'}, timeout=API_TIMEOUT): (idx, data)
+                for idx, data in enumerate(upload_data_list, 1)
+            }
+            for future in as_completed(futures):
+                idx, data = futures[future]
+                try:
+                    response = future.result()
+                    if response.status_code in [200, 201]:
+                        success_count += 1
+                        print(f"   [{idx}/{total}] ✅ 成功 - {data['store_name']}")
+                    else:
+                        fail_count += 1
+                        print(f"   [{idx}/{total}] ❌ 失败 - {data['store_name']}")
+                        print(f"      HTTP状态码: {response.status_code}")
+                        print(f"      响应内容: {response.text[:200] if response.text else '(空)'}")
+                except Exception as e:
                     fail_count += 1
-                    print(f"   [{idx}/{len(upload_data_list)}] ❌ 失败 - {data['store_name']}")
-                    print(f"      HTTP状态码: {response.status_code}")
-                    print(f"      响应内容: {response.text[:200] if response.text else '(空)'}")
-            except Exception as e:
-                fail_count += 1
-                print(f"   [{idx}/{len(upload_data_list)}] ❌ 失败 - {data['store_name']}: {e}")
+                    print(f"   [{idx}/{total}] ❌ 失败 - {data['store_name']}: {e}")
 
         print(f"\n📊 上传完成: 成功 {success_count}, 失败 {fail_count}")
         return fail_count == 0
@@ -5875,10 +6249,11 @@ class DianpingStoreStats:
         result: Dict[str, Dict[str, int]] = {}
         try:
             session = self._get_session()
+            self._wait_dianping_rate_limit()
             response = session.post(url, params=params, data=post_data,
-                                    headers=self._get_headers(), cookies=self.cookies, timeout=60)
+                                    headers=self._get_headers(), timeout=60)
             response.raise_for_status()
-            resp_json = response.json()
+            resp_json = json_loads(response.content)
             if resp_json.get('code') != 200:
                 print(f"   ❌ API返回错误: {resp_json.get('msg')}")
                 return result
@@ -5892,21 +6267,18 @@ class DianpingStoreStats:
                 print("   ❌ 未获取到文件URL")
                 return result
 
-            file_response = session.get(file_url, timeout=60)
-            df = pd.read_excel(BytesIO(file_response.content))
+            file_buf = self._download_report(file_url, f"flowDataSummaryDownloadPCAsync_{date_range}")
+            df = read_excel_bytes(file_buf, usecols=list(self._FLOW_REPORT_COLUMNS))
             print(f"   📊 读取到 {len(df)} 行数据")
 
-            date_col = df.columns[0]
-            shop_id_col = df.columns[3]
-            checkin_col = df.columns[36]
+            date_col, shop_id_col, checkin_col = df.columns
             df[date_col] = pd.to_datetime(df[date_col])
 
-            for _, row in df.iterrows():
-                if not pd.notna(row[shop_id_col]) or not pd.notna(row[date_col]):
-                    continue
-                shop_id = str(int(row[shop_id_col]))
-                date_str = row[date_col].strftime('%Y-%m-%d')
-                checkin = int(row[checkin_col]) if pd.notna(row[checkin_col]) else 0
+            shop_ids = id_column_to_str(df[shop_id_col])
+            valid = shop_ids.notna() & df[date_col].notna()
+            date_strs = df.loc[valid, date_col].dt.strftime('%Y-%m-%d')
+            checkins = pd.to_numeric(df.loc[valid, checkin_col], errors='coerce').fillna(0).astype(int)
+            for shop_id, date_str, checkin in zip(shop_ids[valid].tolist(), date_strs.tolist(), checkins.tolist()):
                 result.setdefault(shop_id, {})[date_str] = checkin
 
             print(f"   ✅ 解析完成: {len(result)} 个门店, "
@@ -5920,12 +6292,6 @@ class DianpingStoreStats:
         print("\n📥 获取近30天强制下线消息...")
         cutoff = (datetime.now() - timedelta(days=30)).date()
         api_url = "https://e.dianping.com/gateway/msg/MessageDzService/queryPcMessageList"
-        headers = {
-            'Accept': 'application/json, text/plain, */*',
-            'Content-Type': 'application/json',
-            'Referer': 'https://e.dianping.com/app/vg-pc-platform-merchant-selfhelp/newNoticeCenter.html',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        }
         result: Dict[str, Dict[str, int]] = {}
         page_no = 1
         page_size = 100
@@ -5933,17 +6299,17 @@ class DianpingStoreStats:
 
         while True:
             try:
+                self._wait_dianping_rate_limit()
                 response = session.post(
                     api_url,
-                    params={'yodaReady': 'h5', 'csecplatform': '4', 'csecversion': '4.1.1'},
-                    headers=headers,
-                    cookies=self.cookies,
-                    json={"messageCategoryCode": 0, "status": None, "subCategoryIdList": None,
-                          "important": 1, "pageNo": page_no, "pageSize": page_size},
+                    params=self._CSEC_PARAMS,
+                    headers=self._NOTICE_CENTER_HEADERS,
+                    data=json_dumps_bytes({"messageCategoryCode": 0, "status": None, "subCategoryIdList": None,
+                                           "important": 1, "pageNo": page_no, "pageSize": page_size}),
                     timeout=30
                 )
                 response.raise_for_status()
-                data = response.json()
+                data = json_loads(response.content)
                 if data.get('status') != 0:
                     print(f"   ⚠️ 消息API返回错误: status={data.get('status')}")
                     break
@@ -6007,10 +6373,10 @@ class DianpingStoreStats:
         default_result = {'order_user_rank': 0, 'verify_amount_rank': 0}
         try:
             session = self._get_session()
-            response = session.get(url, params=params, headers=headers,
-                                   cookies=self.cookies, timeout=60)
+            self._wait_dianping_rate_limit()
+            response = session.get(url, params=params, headers=headers, timeout=60)
             response.raise_for_status()
-            resp_json = response.json()
+            resp_json = json_loads(response.content)
             if resp_json.get('code') != 200:
                 return default_result
 
@@ -6022,23 +6388,20 @@ class DianpingStoreStats:
             if not file_url:
                 return default_result
 
-            file_response = session.get(file_url, timeout=60)
-            df = pd.read_excel(BytesIO(file_response.content))
+            file_buf = self._download_report(file_url, f"shopRankListDownload_{date_str}_{shop_id}_{region_id}")
+            df = read_excel_bytes(file_buf, usecols=list(self._RANK_REPORT_COLUMNS))
             if len(df) == 0:
                 return default_result
 
-            shop_id_col = df.columns[4]
-            order_rank_col = df.columns[10]
-            verify_rank_col = df.columns[14]
+            shop_id_col, order_rank_col, verify_rank_col = df.columns
 
-            for _, row in df.iterrows():
-                if not pd.notna(row[shop_id_col]):
-                    continue
-                if str(int(row[shop_id_col])) == shop_id:
-                    return {
-                        'order_user_rank': self._parse_rank_value(row[order_rank_col]),
-                        'verify_amount_rank': self._parse_rank_value(row[verify_rank_col])
-                    }
+            matched = df[id_column_to_str(df[shop_id_col]) == shop_id]
+            if not matched.empty:
+                row = matched.iloc[0]
+                return {
+                    'order_user_rank': self._parse_rank_value(row[order_rank_col]),
+                    'verify_amount_rank': self._parse_rank_value(row[verify_rank_col])
+                }
         except Exception as e:
             print(f"      ❌ 获取{date_str}排名失败: {e}")
         return default_result
@@ -6142,20 +6505,14 @@ class DianpingStoreStats:
         force_msgs = self._get_force_offline_history()
         ad_balances = self._query_ad_balances(list(missing.keys()))
 
-        shop_name_map = {str(s['shop_id']): s['shop_name'] for s in self.shop_list}
-
-        def get_region_id(shop_id: str):
-            info = self.shop_region_info.get(shop_id, {})
-            return info.get('regions', {}).get('business', {}).get('regionId')
-
         upload_api = UPLOAD_APIS["store_stats"]
         session = self._get_session()
         success_count = 0
         fail_count = 0
 
         for shop_id, missing_dates in missing.items():
-            shop_name = shop_name_map.get(shop_id, shop_id)
-            region_id = get_region_id(shop_id)
+            shop_name = self._shop_by_id.get(shop_id, {}).get('shop_name', shop_id)
+            region_id = self._shop_region_id.get(shop_id)
 
             for date_str in missing_dates:
                 print(f"\n   📌 补全 {shop_name}({shop_id}) {date_str}")
@@ -6302,8 +6659,7 @@ def run_store_stats(account_name: str, start_date: str, end_date: str, external_
         error_msg = str(e)
         result["error_message"] = error_msg
         print(f"❌ 执行失败: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error("store_stats 执行异常", exc_info=True)
         # 上报到 /api/log
         log_failure(account_name, 0, table_name, start_date, end_date, error_msg)
 
@@ -6329,11 +6685,30 @@ class PageDrivenTaskExecutor:
                       review_summary_dianping, review_summary_meituan
     """
 
-    PAGE_NAME_MAP = {
-        "report": "报表页面",
-        "flow_analysis": "客流分析页面",
-        "review": "评价页面",
-    }
+    PAGE_NAME_MAP = PAGE_NAMES
+
+    # 各任务函数除 (account_name, start_date, end_date) 外需要的共享参数（未列出的任务不传额外参数）
+    _TASK_SHARED_ARGS = MappingProxyType({
+        'store_stats': ('external_page', 'cookies', 'mtgsig', 'shop_info', 'compare_regions', 'brands_json'),
+        'kewen_daily_report': ('templates_id', 'cookies', 'mtgsig'),
+        'promotion_daily_report': ('cookies', 'mtgsig'),
+        'review_detail_dianping': ('cookies', 'mtgsig', 'shop_info'),
+        'review_detail_meituan': ('cookies', 'mtgsig', 'shop_info'),
+        'review_summary_dianping': ('cookies', 'mtgsig', 'shop_info'),
+        'review_summary_meituan': ('cookies', 'mtgsig', 'shop_info'),
+    })
+
+    # 页面内容已渲染或已被重定向到登录页（满足其一即可继续判断），用于替代跳转后的固定等待
+    _CONTENT_READY_JS = (
+        "() => location.href.toLowerCase().includes('login') || "
+        "(!!document.body && document.body.textContent.length > 100)"
+    )
+
+    # 页面HTML中是否包含登录失效提示（与原先 page.content() 子串匹配的范围一致）
+    _LOGIN_EXPIRED_HINT_JS = (
+        "() => { const html = document.documentElement ? document.documentElement.outerHTML : '';"
+        " return ['请重新登录', '登录状态失效', '未登录'].some(s => html.includes(s)); }"
+    )
 
     def __init__(self, account_name: str, headless: bool = True, browser_pool: 'BrowserPoolManager' = None):
         """初始化
@@ -6369,6 +6744,9 @@ class PageDrivenTaskExecutor:
         # 执行结果
         self.results = []
 
+        # 后台加载账户信息的 Future（与浏览器启动并发，首次需要 Cookie 时再等待）
+        self._account_info_future = None
+
         # 登录失效标志 - 一旦检测到失效，停止后续所有任务
         self.login_invalid = False
         self.login_invalid_error = ""
@@ -6439,18 +6817,25 @@ class PageDrivenTaskExecutor:
         SHARED_SIGNATURE['brands_json'] = self.brands_json
         SHARED_SIGNATURE['updated_at'] = datetime.now()
 
-    def _convert_cookies_to_playwright_format(self) -> list:
-        """将cookie字典转换为Playwright格式"""
-        playwright_cookies = []
-        for name, value in self.cookies.items():
-            cookie = {
-                'name': name,
-                'value': str(value),
-                'domain': '.dianping.com',
-                'path': '/'
-            }
-            playwright_cookies.append(cookie)
-        return playwright_cookies
+    def _start_loading_account_info(self):
+        """在后台线程中加载账户信息，使API请求与浏览器启动、状态文件登录检测并发进行"""
+        executor = ThreadPoolExecutor(max_workers=1)
+        # 复制当前上下文，保证后台线程的输出仍带有当前账号标签
+        self._account_info_future = executor.submit(contextvars.copy_context().run, self._load_account_info)
+        executor.shutdown(wait=False)
+
+    def _wait_account_info(self):
+        """等待后台账户信息加载完成（加载失败时在此抛出原异常）；未在后台加载时直接返回"""
+        future, self._account_info_future = self._account_info_future, None
+        if future is not None:
+            future.result()
+
+    def _convert_cookies_to_playwright_format(self) -> list:
+        """将cookie字典转换为Playwright格式"""
+        return [
+            {'name': name, 'value': value if type(value) is str else str(value), 'domain': '.dianping.com', 'path': '/'}
+            for name, value in self.cookies.items()
+        ]
 
     def _check_login_status(self, max_retries: int = 2) -> Tuple[bool, str]:
         """检查是否处于登录状态
@@ -6473,19 +6858,18 @@ class PageDrivenTaskExecutor:
                     wait_until='domcontentloaded',
                     timeout=LOGIN_CHECK_TIMEOUT
                 )
-                # 等待页面跳转完全稳定，避免 evaluate 时上下文被销毁
+                # 等待页面内容渲染（或已跳转到登录页），条件满足立即返回，替代 networkidle + 固定 sleep(2)；
+                # 等待结果直接作为内容判断依据，无需再 evaluate 一次
                 try:
-                    self.page.wait_for_load_state('networkidle', timeout=5000)
-                except Exception:
-                    pass
-                time.sleep(2)
+                    self.page.wait_for_function(self._CONTENT_READY_JS, timeout=7000)
+                    has_content = True
+                except PlaywrightTimeoutError:
+                    has_content = False
 
-                current_url = self.page.url
-                if 'login' in current_url.lower():
+                if LOGIN_URL_RE.search(self.page.url):
                     logger.warning("检测到登录页面URL，账户登录状态已失效")
                     return False, "not_logged_in"
 
-                has_content = self.page.evaluate("() => document.body.textContent.length > 100")
                 if has_content:
                     return True, "logged_in"
                 else:
@@ -6493,10 +6877,9 @@ class PageDrivenTaskExecutor:
                     return False, "not_logged_in"
 
             except Exception as e:
-                error_str = str(e).lower()
-                is_timeout = 'timeout' in error_str
-                is_navigation = 'execution context was destroyed' in error_str or \
-                                'most likely because of a navigation' in error_str
+                error_str = str(e)
+                is_timeout = TIMEOUT_ERROR_RE.search(error_str) is not None
+                is_navigation = NAVIGATION_ERROR_RE.search(error_str) is not None
 
                 if is_timeout or is_navigation:
                     if attempt < max_retries:
@@ -6515,19 +6898,86 @@ class PageDrivenTaskExecutor:
 
         return False, "error"
 
+    def _new_browser_context(self, storage_state: Optional[str] = None):
+        """在当前浏览器上创建Context（传统模式），并拦截图片/字体/媒体资源
+
+        Args:
+            storage_state: 保存的登录状态文件路径（可选）
+
+        Returns:
+            Playwright BrowserContext 对象
+        """
+        context = self.browser.new_context(
+            storage_state=storage_state,
+            viewport={'width': 1920, 'height': 1080},
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            proxy=None,
+            bypass_csp=True,
+            ignore_https_errors=True
+        )
+        context.route("**/*", _abort_media_resources)
+        return context
+
+    def _open_fresh_context(self) -> bool:
+        """丢弃当前Context，使用 self.cookies 新建一个
+
+        浏览器池模式：从池中移除旧Context后重新创建
+        传统模式：关闭旧Context（保留browser实例）、删除旧状态文件后在当前浏览器上创建
+
+        Returns:
+            bool: 是否创建成功
+        """
+        # ========== 浏览器池模式 ==========
+        if self.use_pool and self.browser_pool:
+            if self.browser_pool.has_context(self.account_name):
+                self.browser_pool.remove_context(self.account_name)
+                print(f"   ✓ 已移除旧Context")
+
+            self.context = None
+            self.page = None
+            self._context_wrapper = None
+
+            print(f"   正在创建新Context...")
+            self._context_wrapper = self.browser_pool.get_context(self.account_name, self.cookies)
+            if not self._context_wrapper:
+                print(f"❌ 无法从浏览器池创建新Context")
+                return False
+
+            self.context = self._context_wrapper.context
+            self.page = self._context_wrapper.page
+            return True
+
+        # ========== 传统模式 ==========
+        if self.context:
+            try:
+                self.context.close()
+            except:
+                pass
+            self.context = None
+            self.page = None
+
+        try:
+            Path(self.state_file).unlink()
+            print(f"✓ 已删除旧状态文件: {self.state_file}")
+        except FileNotFoundError:
+            pass
+
+        self.context = self._new_browser_context()
+        self.context.add_cookies(self._convert_cookies_to_playwright_format())
+        self.page = self.context.new_page()
+        return True
+
     def _try_relogin(self) -> bool:
         """尝试使用API Cookie重新登录
 
         当检测到Cookie失效时调用此方法尝试重新登录。
 
         流程:
-        1. 关闭当前浏览器上下文
-        2. 删除旧状态文件
-        3. 重新从API获取Cookie
-        4. 使用新Cookie创建浏览器上下文
-        5. 检查登录状态
-        6. 如果成功，保存新状态文件并返回True
-        7. 如果失败，返回False
+        1. 重新从API获取Cookie
+        2. 丢弃当前Context，使用新Cookie创建新的Context
+        3. 检查登录状态（登录检测本身会跳转到消息中心页面）
+        4. 如果成功，保存登录状态、更新共享签名并返回True
+        5. 如果失败，返回False
 
         Returns:
             bool: 重新登录是否成功
@@ -6537,109 +6987,49 @@ class PageDrivenTaskExecutor:
         print("=" * 60)
 
         try:
-            # 3. 重新从API获取Cookie
+            # 1. 重新从API获取Cookie（跳过缓存，确保拿到最新的Cookie）
             print(f"🔍 正在从API重新获取账户 [{self.account_name}] 的Cookie...")
-            api_data = load_cookies_from_api(self.account_name)
+            api_data = load_cookies_from_api(self.account_name, force_refresh=True)
             self.cookies = api_data['cookies']
             self.mtgsig = api_data['mtgsig']
             print(f"✅ 成功加载 {len(self.cookies)} 个新cookies")
 
-            # ========== 浏览器池模式 ==========
-            if self.use_pool and self.browser_pool:
-                print("   使用浏览器池模式重新登录...")
-
-                # 1. 从池中移除旧Context
-                if self.browser_pool.has_context(self.account_name):
-                    self.browser_pool.remove_context(self.account_name)
-                    print(f"   ✓ 已移除旧Context")
-
-                self.context = None
-                self.page = None
-                self._context_wrapper = None
-
-                # 2. 从池中创建新Context
-                print(f"   正在创建新Context...")
-                self._context_wrapper = self.browser_pool.get_context(self.account_name, self.cookies)
-                if not self._context_wrapper:
-                    print(f"❌ 无法从浏览器池创建新Context")
-                    return False
-
-                self.context = self._context_wrapper.context
-                self.page = self._context_wrapper.page
-
-                # 3. 跳转到首页验证登录
-                try:
-                    self.page.goto("https://e.dianping.com/app/merchant-platform/", timeout=30000)
-                    time.sleep(2)
-                except Exception as e:
-                    print(f"   ⚠️ 首页加载失败: {e}")
+            # 2. 使用新Cookie创建Context
+            print("   使用浏览器池模式重新登录..." if self.use_pool and self.browser_pool else "正在使用新Cookie登录...")
+            if not self._open_fresh_context():
+                return False
 
-                # 4. 检查登录状态
-                is_logged_in, status = self._check_login_status()
+            # 3. 检查登录状态
+            is_logged_in, status = self._check_login_status()
 
-                if is_logged_in:
-                    self._context_wrapper.update_last_used()
-                    print(f"✅ 重新登录成功！（浏览器池模式）")
-                    self.login_invalid = False
-                    self.login_invalid_error = ""
-                    return True
-                else:
-                    print(f"❌ 重新登录失败: {status}")
+            if not is_logged_in:
+                # 5. 登录失败
+                print(f"❌ 重新登录失败: {status}")
+                if self.use_pool and self.browser_pool:
                     # 移除失败的Context（跳过Cookie上传，避免覆盖auth_status）
                     self.browser_pool.remove_context(self.account_name, skip_cookie_upload=True)
-                    return False
-
-            # ========== 传统模式 ==========
-            # 1. 关闭当前浏览器上下文（保留browser实例）
-            if self.context:
-                try:
-                    self.context.close()
-                except:
-                    pass
-                self.context = None
-                self.page = None
-
-            # 2. 删除旧状态文件
-            if os.path.exists(self.state_file):
-                os.remove(self.state_file)
-                print(f"✓ 已删除旧状态文件: {self.state_file}")
-
-            # 4. 使用新Cookie创建浏览器上下文
-            print("正在使用新Cookie登录...")
-            playwright_cookies = self._convert_cookies_to_playwright_format()
-            self.context = self.browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                proxy=None,
-                bypass_csp=True,
-                ignore_https_errors=True
-            )
-            self.context.add_cookies(playwright_cookies)
-            self.page = self.context.new_page()
-
-            # 5. 检查登录状态
-            is_logged_in, status = self._check_login_status()
+                return False
 
-            if is_logged_in:
-                # 6. 登录成功，保存新状态文件
+            # 4. 登录成功：浏览器池模式刷新使用时间，传统模式保存新状态文件
+            if self.use_pool and self.browser_pool:
+                self._context_wrapper.update_last_used()
+                print(f"✅ 重新登录成功！（浏览器池模式）")
+            else:
                 self.context.storage_state(path=self.state_file)
                 print(f"✅ 重新登录成功！已保存新状态文件")
-                # 重置登录失效标志
-                self.login_invalid = False
-                self.login_invalid_error = ""
 
-                # 7. 更新 SHARED_SIGNATURE（供后续任务使用新的Cookie/签名）
-                global SHARED_SIGNATURE
-                SHARED_SIGNATURE['cookies'] = self.cookies
-                SHARED_SIGNATURE['mtgsig'] = self.mtgsig
-                SHARED_SIGNATURE['updated_at'] = datetime.now()
-                print(f"✅ 已更新共享签名（重新登录后）")
+            # 重置登录失效标志
+            self.login_invalid = False
+            self.login_invalid_error = ""
 
-                return True
-            else:
-                # 7. 登录失败
-                print(f"❌ 重新登录失败: {status}")
-                return False
+            # 更新 SHARED_SIGNATURE（供后续任务使用新的Cookie/签名）
+            global SHARED_SIGNATURE
+            SHARED_SIGNATURE['cookies'] = self.cookies
+            SHARED_SIGNATURE['mtgsig'] = self.mtgsig
+            SHARED_SIGNATURE['updated_at'] = datetime.now()
+            print(f"✅ 已更新共享签名（重新登录后）")
+
+            return True
 
         except Exception as e:
             print(f"❌ 重新登录过程中发生错误: {e}")
@@ -6650,6 +7040,7 @@ class PageDrivenTaskExecutor:
     def _install_browser(self):
         """自动安装Playwright浏览器"""
         print("\n⚠️ 检测到Chromium浏览器未安装，正在自动下载...")
+        import subprocess  # 仅在首次安装浏览器时用到，按需导入
         try:
             process = subprocess.Popen(
                 [sys.executable, '-m', 'playwright', 'install', 'chromium'],
@@ -6667,7 +7058,7 @@ class PageDrivenTaskExecutor:
         """启动浏览器并登录
 
         浏览器池模式：从池中获取Context，不创建新浏览器
-        传统模式：创建新的浏览器实例
+        传统模式：复用共享浏览器，为当前账户创建新的Context
         """
         if not PLAYWRIGHT_AVAILABLE:
             raise Exception("Playwright未安装，无法启动浏览器")
@@ -6695,19 +7086,13 @@ class PageDrivenTaskExecutor:
                     self.browser_pool.remove_context(self.account_name, skip_cookie_upload=True)
 
             # 从池中创建新Context
+            self._wait_account_info()
             print(f"   正在为账号 {self.account_name} 创建新Context...")
             self._context_wrapper = self.browser_pool.get_context(self.account_name, self.cookies)
             self.context = self._context_wrapper.context
             self.page = self._context_wrapper.page
 
-            # 跳转到首页验证登录
-            try:
-                self.page.goto("https://e.dianping.com/app/merchant-platform/", timeout=30000)
-                time.sleep(2)
-            except Exception as e:
-                print(f"   ⚠️ 首页加载失败: {e}")
-
-            # 检查登录状态
+            # 检查登录状态（登录检测本身会跳转到消息中心页面，无需先打开首页）
             is_logged_in, status = self._check_login_status()
             if not is_logged_in:
                 if status == "not_logged_in":
@@ -6721,50 +7106,33 @@ class PageDrivenTaskExecutor:
                     raise Exception(f"登录检测失败: {status}")
 
             self._context_wrapper.update_last_used()
-            print(f"   ✓ 浏览器已就绪（浏览器池模式，已跳转首页）")
+            print(f"   ✓ 浏览器已就绪（浏览器池模式）")
             return
 
         # ========== 传统模式 ==========
         print("\n🌐 启动浏览器")
-        self.playwright = sync_playwright().start()
-
-        max_retries = 2
-        for attempt in range(max_retries):
-            try:
-                # 使用WebKit（如果浏览器池模式启用）或Chromium
-                if USE_BROWSER_POOL and BROWSER_POOL_AVAILABLE:
-                    self.browser = self.playwright.webkit.launch(
-                        headless=self.headless,
-                        proxy=None
-                    )
-                    print("   使用 WebKit 引擎")
-                else:
-                    self.browser = self.playwright.chromium.launch(
-                        headless=self.headless,
-                        proxy=None
-                    )
-                break
-            except Exception as e:
-                if "Executable doesn't exist" in str(e) and attempt == 0:
-                    if self._install_browser():
-                        continue
-                    else:
-                        raise Exception("浏览器安装失败")
-                raise e
+        if USE_BROWSER_POOL and BROWSER_POOL_AVAILABLE:
+            # 浏览器池降级场景：单独启动 WebKit，任务结束时随执行器一起关闭
+            # 同一线程不能再次 start Playwright；当前线程已有共享驱动（如解析 templates_id 时启动的）则借用它
+            shared_playwright = getattr(_store_stats_browser_local, 'playwright', None)
+            if shared_playwright is None:
+                self.playwright = sync_playwright().start()
+                shared_playwright = self.playwright
+            self.browser = shared_playwright.webkit.launch(
+                headless=self.headless,
+                proxy=None
+            )
+            print("   使用 WebKit 引擎")
+        else:
+            # 复用当前线程的共享 Chromium（进程内只启动一次），每个账户只新建独立的Context
+            self.browser = get_store_stats_browser(headless=self.headless, install_browser=self._install_browser)
 
         use_saved_state = os.path.exists(self.state_file)
 
         if use_saved_state:
             print(f"✓ 检测到状态文件: {self.state_file}")
             try:
-                self.context = self.browser.new_context(
-                    storage_state=self.state_file,
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                    proxy=None,
-                    bypass_csp=True,
-                    ignore_https_errors=True
-                )
+                self.context = self._new_browser_context(storage_state=self.state_file)
                 self.page = self.context.new_page()
                 is_logged_in, status = self._check_login_status()
                 if is_logged_in:
@@ -6780,15 +7148,10 @@ class PageDrivenTaskExecutor:
                 use_saved_state = False
 
         if not use_saved_state:
+            self._wait_account_info()
             print("正在使用Cookie登录...")
             playwright_cookies = self._convert_cookies_to_playwright_format()
-            self.context = self.browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                proxy=None,
-                bypass_csp=True,
-                ignore_https_errors=True
-            )
+            self.context = self._new_browser_context()
             self.context.add_cookies(playwright_cookies)
             self.page = self.context.new_page()
 
@@ -6812,7 +7175,7 @@ class PageDrivenTaskExecutor:
         """关闭浏览器
 
         浏览器池模式：不关闭Context，保留在池中供保活使用
-        传统模式：关闭浏览器
+        传统模式：关闭Context（共享浏览器保留复用）
         """
         # 浏览器池模式：不关闭，保留Context供后续使用
         if self.use_pool and self._context_wrapper:
@@ -6829,15 +7192,23 @@ class PageDrivenTaskExecutor:
                     print(f"   ⚠️ Cookie上传失败: {e}")
             return
 
-        # 传统模式：关闭浏览器
+        # 传统模式：只关闭本账户的Context，共享浏览器留给后续账户复用
         if self.context:
             self.context.close()
-        if self.browser:
+        # 单独启动的 WebKit 浏览器随执行器一起关闭；借用的共享驱动不停止
+        if self.browser and self.browser is not getattr(_store_stats_browser_local, 'browser', None):
             self.browser.close()
         if self.playwright:
             self.playwright.stop()
         print("✓ 浏览器已关闭")
 
+    def _is_page_content_ready(self) -> bool:
+        """页面内容是否已渲染（或已被重定向到登录页），检测失败视为未就绪"""
+        try:
+            return bool(self.page.evaluate(self._CONTENT_READY_JS))
+        except Exception:
+            return False
+
     def navigate_to_page(self, page_key: str, max_retries: int = 2):
         """跳转到指定页面
 
@@ -6845,36 +7216,42 @@ class PageDrivenTaskExecutor:
             page_key: 页面键名 (report, flow_analysis, review)
             max_retries: 最大重试次数
         """
-        page_url = PAGE_URLS.get(page_key)
-        page_name = self.PAGE_NAME_MAP.get(page_key, page_key)
-
-        if not page_url:
+        page_meta = _PAGE_META.get(page_key)
+        if not page_meta:
             logger.warning(f"未找到页面URL: {page_key}")
             return False
+        page_url, page_name, page_url_prefix = page_meta
 
         print(f"\n{'=' * 60}")
         print(f"🔗 正在跳转到 {page_name}...")
-        print(f"   URL: {page_url[:80]}...")
+        print(f"   URL: {page_url_prefix}...")
         print(f"{'=' * 60}")
 
         for attempt in range(1, max_retries + 1):
             try:
-                # 使用 load 而不是 networkidle，避免因持续网络请求导致超时
-                self.page.goto(page_url, wait_until='load', timeout=BROWSER_PAGE_TIMEOUT)
-                time.sleep(3)  # 等待页面稳定
+                # DOM 就绪即可，不等待广告/统计等子资源；随后等到页面内容渲染为止，替代固定 sleep(3)
+                try:
+                    self.page.goto(page_url, wait_until='domcontentloaded', timeout=BROWSER_PAGE_TIMEOUT)
+                except Exception as e:
+                    # 跳转超时但页面内容已经可用（被个别慢请求拖住）时直接继续，不再整页重试
+                    if not TIMEOUT_ERROR_RE.search(str(e)) or not self._is_page_content_ready():
+                        raise
+                    logger.warning(f"{page_name} 加载超时，但页面内容已可用，继续执行")
+                try:
+                    self.page.wait_for_function(self._CONTENT_READY_JS, timeout=7000)
+                except Exception:
+                    pass
 
                 # 检查是否被重定向到登录页面
-                current_url = self.page.url.lower()
-                if 'login' in current_url or 'passport' in current_url:
+                if LOGIN_URL_RE.search(self.page.url):
                     print(f"🚨 检测到页面被重定向到登录页，Cookie已失效")
                     self.login_invalid = True
                     self.login_invalid_error = "页面跳转时检测到Cookie失效（重定向到登录页）"
                     return False
 
-                # 检查页面内容是否包含登录失效提示
+                # 检查页面内容是否包含登录失效提示（在浏览器内匹配，只回传布尔值，不拉取整页HTML）
                 try:
-                    page_content = self.page.content()
-                    if '请重新登录' in page_content or '登录状态失效' in page_content or '未登录' in page_content:
+                    if self.page.evaluate(self._LOGIN_EXPIRED_HINT_JS):
                         print(f"🚨 检测到页面包含登录失效提示，Cookie已失效")
                         self.login_invalid = True
                         self.login_invalid_error = "页面跳转时检测到Cookie失效（页面提示未登录）"
@@ -6888,12 +7265,15 @@ class PageDrivenTaskExecutor:
                 print(f"✅ 已跳转到 {page_name}")
                 return True
             except Exception as e:
-                error_str = str(e).lower()
-                is_timeout = 'timeout' in error_str
+                error_str = str(e)
+                is_timeout = TIMEOUT_ERROR_RE.search(error_str) is not None
+                is_navigation = NAVIGATION_ERROR_RE.search(error_str) is not None
 
-                if is_timeout and attempt < max_retries:
+                # 超时/跳转导致上下文销毁属于临时性错误，按指数退避重试；其他错误直接失败
+                if (is_timeout or is_navigation) and attempt < max_retries:
                     delay = calculate_retry_delay(attempt)
-                    logger.warning(f"页面加载超时，第 {attempt}/{max_retries} 次尝试，"
+                    reason = "页面加载超时" if is_timeout else "页面跳转导致上下文销毁"
+                    logger.warning(f"{reason}，第 {attempt}/{max_retries} 次尝试，"
                                    f"{delay:.1f} 秒后重试...")
                     time.sleep(delay)
                     continue
@@ -6914,13 +7294,12 @@ class PageDrivenTaskExecutor:
         Returns:
             任务执行结果列表
         """
-        tasks = PAGE_TASKS.get(page_key, [])
         page_name = self.PAGE_NAME_MAP.get(page_key, page_key)
         results = []
 
-        # 过滤掉已禁用的任务
-        enabled_tasks = [t for t in tasks if not TASK_DISABLED_FLAGS.get(t, False)]
-        disabled_tasks = [t for t in tasks if TASK_DISABLED_FLAGS.get(t, False)]
+        # 已禁用的任务按页面预先过滤
+        enabled_tasks = _PAGE_ENABLED_TASKS.get(page_key, ())
+        disabled_tasks = _PAGE_DISABLED_TASKS.get(page_key, ())
 
         print(f"\n📋 {page_name} 需要执行 {len(enabled_tasks)} 个任务: {', '.join(enabled_tasks)}")
         if disabled_tasks:
@@ -6936,82 +7315,97 @@ class PageDrivenTaskExecutor:
                 "error_message": "任务已禁用(默认成功)"
             })
 
-        for task_name in enabled_tasks:
-            print(f"\n{'─' * 50}")
-            print(f"▶ 开始执行任务: {task_name}")
-            print(f"{'─' * 50}")
+        # 不操作浏览器页面的任务（只用 cookies/mtgsig 发请求）彼此独立，可在线程池中并发执行；
+        # 各任务错开启动（相邻两次提交之间保留与串行模式相同的随机延迟），避免同一账号同时请求点评；
+        # 需要页面的任务（store_stats）仍在当前线程串行执行，Playwright 同步API只能在创建它的线程中使用
+        if len(enabled_tasks) > 1 and not any(
+                'external_page' in self._TASK_SHARED_ARGS.get(t, ()) for t in enabled_tasks):
+            print(f"   ⚡ 并发执行 {len(enabled_tasks)} 个任务")
+            shared_args = self._collect_shared_args()
+            with ThreadPoolExecutor(max_workers=min(PAGE_TASK_MAX_WORKERS, len(enabled_tasks))) as pool:
+                futures = []
+                for i, task_name in enumerate(enabled_tasks):
+                    if i:
+                        random_delay(2, 4)
+                    futures.append(pool.submit(contextvars.copy_context().run, self._run_single_task,
+                                               task_name, start_date, end_date, shared_args))
+                results.extend(future.result() for future in futures)
+            return results
+
+        # 共享数据快照：SHARED_SIGNATURE 每次写入都会刷新 updated_at，时间戳不变时直接复用
+        shared_args = None
+        signature_stamp = None
 
+        for task_name in enabled_tasks:
             # 获取最新的共享数据（可能被前一个任务更新，如 store_stats 更新签名）
-            current_cookies = SHARED_SIGNATURE.get('cookies') or self.cookies
-            current_mtgsig = SHARED_SIGNATURE.get('mtgsig') or self.mtgsig
-            current_shop_info = SHARED_SIGNATURE.get('shop_list') or self.shop_info
-            current_compare_regions = SHARED_SIGNATURE.get('compare_regions') or self.compare_regions
-            current_brands_json = SHARED_SIGNATURE.get('brands_json') or self.brands_json
-
-            task_func = TASK_MAP.get(task_name)
-            if task_func:
-                # 报表任务使用近30天日期范围
-                if task_name in ('kewen_daily_report', 'promotion_daily_report'):
-                    end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-                    task_start_date = (end_dt - timedelta(days=29)).strftime('%Y-%m-%d')
-                else:
-                    task_start_date = start_date
+            current_stamp = SHARED_SIGNATURE.get('updated_at')
+            if shared_args is None or current_stamp != signature_stamp:
+                signature_stamp = current_stamp
+                shared_args = self._collect_shared_args()
 
-                # 所有任务都传递共享的 cookies, mtgsig, shop_info（避免重复调用API）
-                if task_name == 'store_stats':
-                    result = task_func(
-                        self.account_name, start_date, end_date,
-                        external_page=self.page,
-                        cookies=current_cookies,
-                        mtgsig=current_mtgsig,
-                        shop_info=current_shop_info,
-                        compare_regions=current_compare_regions,
-                        brands_json=current_brands_json
-                    )
-                elif task_name == 'kewen_daily_report':
-                    result = task_func(
-                        self.account_name, task_start_date, end_date,
-                        templates_id=self.templates_id,
-                        cookies=current_cookies,
-                        mtgsig=current_mtgsig
-                    )
-                elif task_name == 'promotion_daily_report':
-                    result = task_func(
-                        self.account_name, task_start_date, end_date,
-                        cookies=current_cookies,
-                        mtgsig=current_mtgsig
-                    )
-                elif task_name in ('review_detail_dianping', 'review_detail_meituan',
-                                   'review_summary_dianping', 'review_summary_meituan'):
-                    result = task_func(
-                        self.account_name, start_date, end_date,
-                        cookies=current_cookies,
-                        mtgsig=current_mtgsig,
-                        shop_info=current_shop_info
-                    )
-                else:
-                    # 其他任务（兼容）
-                    result = task_func(self.account_name, start_date, end_date)
-                results.append(result)
-
-                if result.get('success'):
-                    print(f"✅ 任务 {task_name} 执行成功")
-                else:
-                    print(f"❌ 任务 {task_name} 执行失败: {result.get('error_message')}")
-            else:
-                print(f"⚠️ 未找到任务函数: {task_name}")
-                results.append({
-                    "task_name": task_name,
-                    "success": False,
-                    "record_count": 0,
-                    "error_message": f"未找到任务函数"
-                })
+            results.append(self._run_single_task(task_name, start_date, end_date, shared_args))
 
             # 任务间随机延迟
             random_delay(2, 4)
 
         return results
 
+    def _collect_shared_args(self) -> Dict[str, Any]:
+        """汇总各任务共用的参数（优先取 SHARED_SIGNATURE 中最新的签名数据）"""
+        return {
+            'external_page': self.page,
+            'templates_id': self.templates_id,
+            'cookies': SHARED_SIGNATURE.get('cookies') or self.cookies,
+            'mtgsig': SHARED_SIGNATURE.get('mtgsig') or self.mtgsig,
+            'shop_info': SHARED_SIGNATURE.get('shop_list') or self.shop_info,
+            'compare_regions': SHARED_SIGNATURE.get('compare_regions') or self.compare_regions,
+            'brands_json': SHARED_SIGNATURE.get('brands_json') or self.brands_json,
+        }
+
+    def _run_single_task(self, task_name: str, start_date: str, end_date: str,
+                         shared_args: Dict[str, Any]) -> Dict[str, Any]:
+        """执行单个任务
+
+        Args:
+            task_name: 任务名称
+            start_date: 开始日期
+            end_date: 结束日期
+            shared_args: _collect_shared_args 汇总的共用参数
+
+        Returns:
+            任务执行结果
+        """
+        print(f"\n{'─' * 50}")
+        print(f"▶ 开始执行任务: {task_name}")
+        print(f"{'─' * 50}")
+
+        task_func = TASK_MAP.get(task_name)
+        if not task_func:
+            print(f"⚠️ 未找到任务函数: {task_name}")
+            return {
+                "task_name": task_name,
+                "success": False,
+                "record_count": 0,
+                "error_message": f"未找到任务函数"
+            }
+
+        # 报表任务使用近30天日期范围
+        if task_name in ('kewen_daily_report', 'promotion_daily_report'):
+            end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+            task_start_date = (end_dt - timedelta(days=29)).strftime('%Y-%m-%d')
+        else:
+            task_start_date = start_date
+
+        # 所有任务都传递共享的 cookies, mtgsig, shop_info（避免重复调用API）
+        task_kwargs = {name: shared_args[name] for name in self._TASK_SHARED_ARGS.get(task_name, ())}
+        result = task_func(self.account_name, task_start_date, end_date, **task_kwargs)
+
+        if result.get('success'):
+            print(f"✅ 任务 {task_name} 执行成功")
+        else:
+            print(f"❌ 任务 {task_name} 执行失败: {result.get('error_message')}")
+        return result
+
     def run_all_tasks(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
         """按页面顺序执行所有任务
 
@@ -7041,8 +7435,9 @@ class PageDrivenTaskExecutor:
 
         try:
             self._disable_proxy()
-            self._load_account_info()
+            self._start_loading_account_info()
             self.start_browser()
+            self._wait_account_info()
 
             # ========== 检查并自动获取/创建 templates_id ==========
             if not self.templates_id or self.templates_id == 0 or str(self.templates_id) == '0':
@@ -7083,14 +7478,9 @@ class PageDrivenTaskExecutor:
                         # 重新登录失败，上报并退出
                         report_auth_invalid(self.account_name)
                         # 将剩余任务标记为失败
-                        for remaining_page_key in PAGE_ORDER[PAGE_ORDER.index(page_key):]:
-                            for task_name in PAGE_TASKS.get(remaining_page_key, []):
-                                all_results.append({
-                                    "task_name": task_name,
-                                    "success": False,
-                                    "record_count": 0,
-                                    "error_message": f"Cookie失效且重新登录失败: {self.login_invalid_error}"
-                                })
+                        all_results.extend(_failed_results(
+                            _REMAINING_PAGE_TASKS[page_key],
+                            f"Cookie失效且重新登录失败: {self.login_invalid_error}"))
                         break
 
                 page_name = self.PAGE_NAME_MAP.get(page_key)
@@ -7122,14 +7512,9 @@ class PageDrivenTaskExecutor:
                             handle_auth_invalid(self.account_name, start_date, end_date,
                                               "page_navigate", self.login_invalid_error)
                             # 将所有任务标记为失败
-                            for remaining_page_key in PAGE_ORDER[PAGE_ORDER.index(page_key):]:
-                                for task_name in PAGE_TASKS.get(remaining_page_key, []):
-                                    all_results.append({
-                                        "task_name": task_name,
-                                        "success": False,
-                                        "record_count": 0,
-                                        "error_message": f"Cookie失效且重新登录失败: {self.login_invalid_error}"
-                                    })
+                            all_results.extend(_failed_results(
+                                _REMAINING_PAGE_TASKS[page_key],
+                                f"Cookie失效且重新登录失败: {self.login_invalid_error}"))
                             break
                     else:
                         # 普通跳转失败，跳过该页面的任务
@@ -7213,6 +7598,14 @@ class PageDrivenTaskExecutor:
         return all_results
 
 
+def _failed_results(task_names, error_msg: str) -> List[Dict[str, Any]]:
+    """为一组未执行的任务生成失败结果"""
+    return [
+        {"task_name": task_name, "success": False, "record_count": 0, "error_message": error_msg}
+        for task_name in task_names
+    ]
+
+
 def run_page_driven_tasks(account_name: str, start_date: str, end_date: str, headless: bool = True, browser_pool: 'BrowserPoolManager' = None) -> List[Dict[str, Any]]:
     """执行页面驱动的任务
 
@@ -7252,10 +7645,34 @@ TASK_MAP = {
     'review_summary_meituan': run_review_summary_meituan,
 }
 
+# 合法的任务名称（任务配置校验用）
+_VALID_TASK_NAMES = frozenset(TASK_MAP) | {'all'}
+
 
 # ============================================================================
 # 任务调度API函数
 # ============================================================================
+def _post_task_api(url: str, json_param: Dict[str, Any], description: str,
+                   headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    """通过共享Session POST调度API，网络异常或5xx时按指数退避重试（0.5s→1s→2s）
+
+    Args:
+        url: 接口地址
+        json_param: 请求体
+        description: 请求描述，用于重试日志
+        headers: 附加请求头（如幂等键）
+
+    Returns:
+        响应对象（重试耗尽时抛出最后一次异常）
+    """
+    return retry_request(
+        lambda: TASK_API_SESSION.post(url, json=json_param, headers=headers, timeout=API_TIMEOUT),
+        max_attempts=TASK_API_MAX_ATTEMPTS,
+        description=description,
+        initial_delay=TASK_API_RETRY_INITIAL_DELAY,
+    )
+
+
 def create_task_schedule() -> bool:
     """生成任务调度
 
@@ -7272,13 +7689,12 @@ def create_task_schedule() -> bool:
     data_start_date = (today - timedelta(days=2)).strftime("%Y-%m-%d")
     data_end_date = (today - timedelta(days=1)).strftime("%Y-%m-%d")
 
-    headers = {'Content-Type': 'application/json'}
     json_param = {
         "task_date": task_date,
         "data_start_date": data_start_date,
-        "data_end_date": data_end_date
+        "data_end_date": data_end_date,
+        "task_priority": TASK_TYPE_PRIORITY,
     }
-    proxies = {'http': None, 'https': None}
 
     print(f"\n{'=' * 80}")
     print("📅 生成任务调度")
@@ -7289,13 +7705,7 @@ def create_task_schedule() -> bool:
     print(f"   data_end_date (昨天): {data_end_date}")
 
     try:
-        response = requests.post(
-            TASK_SCHEDULE_API_URL,
-            headers=headers,
-            data=json.dumps(json_param),
-            proxies=proxies,
-            timeout=30
-        )
+        response = _post_task_api(TASK_SCHEDULE_API_URL, json_param, "生成任务调度")
         print(f"   HTTP状态码: {response.status_code}")
         print(f"   响应内容: {response.text[:500] if response.text else '(空)'}")
 
@@ -7310,62 +7720,63 @@ def create_task_schedule() -> bool:
         return False
 
 
-def fetch_task(server_ip: str = None) -> Optional[Dict[str, Any]]:
-    """获取一条待执行任务
+def fetch_tasks(server_ip: str = None, batch: int = FETCH_TASK_BATCH,
+                exclude_accounts: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """批量获取待执行任务
 
-    调用 get_task API 获取任务信息
+    调用 get_task API，一次领取至多 batch 条任务（服务端按优先级降序、创建时间升序排列），
+    由调用方在本地逐个执行，减少轮询往返。兼容旧接口只返回单条任务对象的情况。
 
     Args:
         server_ip: 服务器IP地址（用于任务分配）
+        batch: 本次最多领取的任务数
+        exclude_accounts: 本次不领取的账户（如刚因账号锁被占用而归还任务的账户）
 
     Returns:
-        dict: 任务信息，包含 id, account_id, task_type, data_start_date, data_end_date 等
-        None: 如果没有任务或获取失败
+        list: 任务信息列表，每项包含 id, account_id, task_type, data_start_date, data_end_date 等；
+              没有任务或获取失败时为空列表
     """
-    headers = {'Content-Type': 'application/json'}
-    proxies = {'http': None, 'https': None}
-
     print(f"\n{'=' * 80}")
     print("📋 获取待执行任务")
     print(f"{'=' * 80}")
     print(f"   URL: {GET_TASK_API_URL}")
 
     # 构建请求参数
-    json_param = {}
+    json_param = {"batch": batch, "order_by": "priority_desc,created_at_asc"}
     if server_ip:
         json_param["server"] = server_ip
         print(f"   Server IP: {server_ip}")
+    if exclude_accounts:
+        json_param["exclude_accounts"] = exclude_accounts
+        print(f"   排除账户: {', '.join(exclude_accounts)}")
 
     try:
-        response = requests.post(
-            GET_TASK_API_URL,
-            json=json_param,
-            proxies=proxies,
-            timeout=30
-        )
+        response = _post_task_api(GET_TASK_API_URL, json_param, "获取任务")
         print(f"   HTTP状态码: {response.status_code}")
         print(f"   响应内容: {response.text[:500] if response.text else '(空)'}")
 
         if response.status_code == 200:
             result = response.json()
-            # API返回格式: {"success":true,"data":{...}}
+            # API返回格式: {"success":true,"data":[{...}, ...]}（旧接口为单个对象 {"data":{...}}）
             task_data = result.get('data') if result.get('success') else None
+            if isinstance(task_data, dict):
+                task_data = [task_data]
             if task_data:
-                print(f"   ✅ 获取任务成功")
-                print(f"   任务ID: {task_data.get('id')}")
-                print(f"   账户: {task_data.get('account_id')}")
-                print(f"   任务类型: {task_data.get('task_type')}")
-                print(f"   数据日期: {task_data.get('data_start_date')} 至 {task_data.get('data_end_date')}")
+                print(f"   ✅ 获取任务成功，共 {len(task_data)} 条")
+                for task in task_data:
+                    print(f"   任务ID: {task.get('id')}, 账户: {task.get('account_id')}, "
+                          f"任务类型: {task.get('task_type')}, "
+                          f"数据日期: {task.get('data_start_date')} 至 {task.get('data_end_date')}")
                 return task_data
             else:
                 print("   ⚠️ 没有待执行的任务")
-                return None
+                return []
         else:
             print(f"   ❌ 获取任务失败: HTTP {response.status_code}")
-            return None
+            return []
     except Exception as e:
         print(f"   ❌ 获取任务异常: {e}")
-        return None
+        return []
 
 
 def is_context_closed_error(e: Exception) -> bool:
@@ -7388,7 +7799,7 @@ def report_task_callback(task_id: int, status: int, error_message: str, retry_ad
     """上报任务完成状态
 
     Args:
-        task_id: 任务ID (从fetch_task获取)
+        task_id: 任务ID (从fetch_tasks获取)
         status: 状态 (2=全部完成, 3=有任务失败)
         error_message: 错误信息 (status=3时需要填写)
         retry_add: 重试次数增加 (status=2时为0, status=3时为1)
@@ -7396,14 +7807,12 @@ def report_task_callback(task_id: int, status: int, error_message: str, retry_ad
     Returns:
         bool: 是否上报成功
     """
-    headers = {'Content-Type': 'application/json'}
     json_param = {
         "id": task_id,
         "status": status,
         "error_message": error_message,
         "retry_add": retry_add
     }
-    proxies = {'http': None, 'https': None}
 
     print(f"\n{'=' * 80}")
     print("📤 上报任务完成状态")
@@ -7416,13 +7825,9 @@ def report_task_callback(task_id: int, status: int, error_message: str, retry_ad
     print(f"   retry_add: {retry_add}")
 
     try:
-        response = requests.post(
-            TASK_CALLBACK_API_URL,
-            headers=headers,
-            data=json.dumps(json_param),
-            proxies=proxies,
-            timeout=30
-        )
+        # 同一任务同一状态的回调带相同幂等键，重试导致的重复请求可由服务端识别忽略
+        response = _post_task_api(TASK_CALLBACK_API_URL, json_param, "任务状态上报",
+                                  headers={'Idempotency-Key': f"task-callback-{task_id}-{status}"})
         print(f"   HTTP状态码: {response.status_code}")
         print(f"   响应内容: {response.text[:500] if response.text else '(空)'}")
 
@@ -7536,20 +7941,12 @@ def reset_task_schedule(task_id: int) -> bool:
     Returns:
         bool: 是否重置成功
     """
-    headers = {'Content-Type': 'application/json'}
     json_param = {"id": task_id}
-    proxies = {'http': None, 'https': None}
 
     print(f"   🔄 重置任务 {task_id}（资源不足，归还任务）...")
 
     try:
-        response = requests.post(
-            TASK_RESET_API_URL,
-            headers=headers,
-            data=json.dumps(json_param),
-            proxies=proxies,
-            timeout=30
-        )
+        response = _post_task_api(TASK_RESET_API_URL, json_param, "任务重置")
 
         if response.status_code == 200:
             print(f"   ✅ 任务 {task_id} 已重置，将在资源恢复后重新执行")
@@ -7570,21 +7967,13 @@ def reschedule_failed_tasks() -> bool:
     Returns:
         bool: 是否成功
     """
-    headers = {'Content-Type': 'application/json'}
-    proxies = {'http': None, 'https': None}
-
     print(f"\n{'=' * 80}")
     print("🔄 重新调度失败任务")
     print(f"{'=' * 80}")
     print(f"   URL: {RESCHEDULE_FAILED_API_URL}")
 
     try:
-        response = requests.post(
-            RESCHEDULE_FAILED_API_URL,
-            json={},
-            proxies=proxies,
-            timeout=30
-        )
+        response = _post_task_api(RESCHEDULE_FAILED_API_URL, {}, "失败任务重新调度")
         print(f"   HTTP状态码: {response.status_code}")
         print(f"   响应内容: {response.text[:500] if response.text else '(空)'}")
 
@@ -7600,29 +7989,38 @@ def reschedule_failed_tasks() -> bool:
 
 
 def validate_date(date_str: str) -> bool:
-    """验证日期格式"""
+    """验证日期格式（YYYY-MM-DD）
+
+    fromisoformat 走C实现的快速路径；Python 3.11+ 还接受 20250101、带时间等其他ISO格式，
+    因此额外校验长度和分隔符位置。
+    """
     try:
-        datetime.strptime(date_str, '%Y-%m-%d')
-        return True
-    except ValueError:
+        datetime.fromisoformat(date_str)
+    except (TypeError, ValueError):
         return False
+    return len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-'
 
 
 def print_summary(results: List[Dict[str, Any]]):
-    """打印执行摘要"""
-    print("\n" + "=" * 80)
-    print("执行摘要")
-    print("=" * 80)
-
-    success_count = sum(1 for r in results if r.get('success'))
-    print(f"总任务数: {len(results)}, 成功: {success_count}, 失败: {len(results) - success_count}")
-    print("-" * 40)
-
+    """打印执行摘要（一次遍历统计并拼好各行，整体只输出一次）"""
+    lines = []
+    success_count = 0
     for result in results:
-        status = "✅" if result.get('success') else "❌"
-        print(f"{status} {result.get('task_name')}: 记录数={result.get('record_count', 0)}, 错误={result.get('error_message', '无')}")
-
-    print("=" * 80)
+        ok = bool(result.get('success'))
+        success_count += ok
+        lines.append(f"{'✅' if ok else '❌'} {result.get('task_name')}: "
+                     f"记录数={result.get('record_count', 0)}, 错误={result.get('error_message', '无')}")
+
+    print("\n".join([
+        "",
+        "=" * 80,
+        "执行摘要",
+        "=" * 80,
+        f"总任务数: {len(results)}, 成功: {success_count}, 失败: {len(results) - success_count}",
+        "-" * 40,
+        *lines,
+        "=" * 80,
+    ]))
 
 
 def _get_mysql_connection():
@@ -7755,13 +8153,59 @@ def execute_single_task(task_info: Dict[str, Any], browser_pool: 'BrowserPoolMan
     # 设置当前账号上下文（让所有 print 输出自动带上账号标签）
     set_current_account(task_info.get("account_id", ""))
 
+    # 任务末尾提交到后台的上报请求，返回前统一等待完成
+    pending_reports = []
     try:
-        return _execute_single_task_inner(task_info, browser_pool)
+        return _execute_single_task_inner(task_info, browser_pool, pending_reports)
     finally:
+        if pending_reports:
+            wait_futures(pending_reports, timeout=TASK_REPORT_WAIT_TIMEOUT)
         clear_current_account()
 
 
-def _execute_single_task_inner(task_info: Dict[str, Any], browser_pool: 'BrowserPoolManager' = None) -> bool:
+# 任务结束时的状态上报线程池（与任务回调并发发送，共用 TASK_API_SESSION 的连接池）
+_REPORT_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='report')
+
+
+def _report_task_failure(task_id: int, account_name: str, start_date: str, end_date: str,
+                         check_name: str, error_msg: str, retry_add: int = 1,
+                         upload_status: bool = True, report_auth: bool = False):
+    """上报任务失败（失败日志、任务状态、调度状态）
+
+    几项上报互不依赖，在线程池中并发发出，总耗时约为一次往返而不是逐个串行等待。
+
+    Args:
+        task_id: 任务ID
+        account_name: 账户名称
+        start_date: 开始日期
+        end_date: 结束日期
+        check_name: 失败环节名称（写入日志的 table_name / task_name）
+        error_msg: 错误信息
+        retry_add: 重试次数增加
+        upload_status: 是否同时上报 data_upload_log 任务状态
+        report_auth: 是否同时上报账户登录失效
+    """
+    calls = [
+        (log_failure, account_name, 0, check_name, start_date, end_date, error_msg),
+        (_update_task_schedule_direct, task_id, 3, error_msg, retry_add),
+    ]
+    if upload_status:
+        calls.append((upload_task_status_batch, account_name, start_date, end_date, [{
+            'task_name': check_name,
+            'success': False,
+            'record_count': 0,
+            'error_message': error_msg
+        }]))
+    if report_auth:
+        calls.append((report_auth_invalid, account_name))
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        for call in calls:
+            executor.submit(contextvars.copy_context().run, *call)
+
+
+def _execute_single_task_inner(task_info: Dict[str, Any], browser_pool: 'BrowserPoolManager' = None,
+                               pending_reports: Optional[list] = None) -> bool:
     global ACCOUNT_NAME, START_DATE, END_DATE, TASK, TARGET_DATE
 
     task_id = task_info.get("id")
@@ -7778,9 +8222,10 @@ def _execute_single_task_inner(task_info: Dict[str, Any], browser_pool: 'Browser
     end_date = END_DATE
     task = TASK
 
+    today = datetime.now()
+
     # 评价详细任务使用近7天日期（昨天往前推6天）
     if task in ['review_detail_dianping', 'review_detail_meituan']:
-        today = datetime.now()
         end_date = (today - timedelta(days=1)).strftime("%Y-%m-%d")  # 昨天
         start_date = (today - timedelta(days=7)).strftime("%Y-%m-%d")  # 昨天往前6天
         START_DATE = start_date
@@ -7788,7 +8233,6 @@ def _execute_single_task_inner(task_info: Dict[str, Any], browser_pool: 'Browser
 
     # 报表任务使用近30天日期（昨天往前推29天，共30天）
     if task in ['kewen_daily_report', 'promotion_daily_report']:
-        today = datetime.now()
         end_date = (today - timedelta(days=1)).strftime("%Y-%m-%d")  # 昨天
         start_date = (today - timedelta(days=30)).strftime("%Y-%m-%d")  # 昨天往前29天
         START_DATE = start_date
@@ -7817,17 +8261,15 @@ def _execute_single_task_inner(task_info: Dict[str, Any], browser_pool: 'Browser
         _update_task_schedule_direct(task_id, status=3, error_message=error_msg, retry_add=1)
         return False
 
-    start = datetime.strptime(start_date, '%Y-%m-%d')
-    end = datetime.strptime(end_date, '%Y-%m-%d')
-    if start > end:
+    # 已校验为 YYYY-MM-DD，等长字符串按字典序比较即为日期先后
+    if start_date > end_date:
         error_msg = "开始日期不能大于结束日期"
         print(f"❌ {error_msg}")
         _update_task_schedule_direct(task_id, status=3, error_message=error_msg, retry_add=1)
         return False
 
-    valid_tasks = ['all'] + list(TASK_MAP.keys())
-    if task not in valid_tasks:
-        error_msg = f"无效的任务名称: {task}，可选值: {', '.join(valid_tasks)}"
+    if task not in _VALID_TASK_NAMES:
+        error_msg = f"无效的任务名称: {task}，可选值: {', '.join(['all', *TASK_MAP])}"
         print(f"❌ {error_msg}")
         _update_task_schedule_direct(task_id, status=3, error_message=error_msg, retry_add=1)
         return False
@@ -7837,20 +8279,15 @@ def _execute_single_task_inner(task_info: Dict[str, Any], browser_pool: 'Browser
     print("🔍 检查平台账户配置")
     print(f"{'=' * 80}")
 
+    # 实时获取：Cookie/签名会随重新登录变化，不能使用缓存
     platform_account = get_platform_account(account_name)
+    platform_config = remember_platform_config(account_name, platform_account)
 
     if not platform_account.get('success'):
         error_msg = f"获取平台账户信息失败: {platform_account.get('error_message', '未知错误')}"
         print(f"❌ {error_msg}")
         # 同时上报到两个日志接口
-        log_failure(account_name, 0, "platform_account_check", start_date, end_date, error_msg)
-        upload_task_status_batch(account_name, start_date, end_date, [{
-            'task_name': 'platform_account_check',
-            'success': False,
-            'record_count': 0,
-            'error_message': error_msg
-        }])
-        _update_task_schedule_direct(task_id, status=3, error_message=error_msg, retry_add=1)
+        _report_task_failure(task_id, account_name, start_date, end_date, "platform_account_check", error_msg)
         return False
 
     # 检查 auth_status 是否为无效状态
@@ -7858,19 +8295,12 @@ def _execute_single_task_inner(task_info: Dict[str, Any], browser_pool: 'Browser
     if auth_status == 'invalid':
         error_msg = f"账户Cookie已失效(auth_status=invalid)，请重新登录"
         print(f"❌ {error_msg}")
-        # 同时上报到两个日志接口
-        log_failure(account_name, 0, "auth_status_check", start_date, end_date, error_msg)
-        upload_task_status_batch(account_name, start_date, end_date, [{
-            'task_name': 'auth_status_check',
-            'success': False,
-            'record_count': 0,
-            'error_message': error_msg
-        }])
-        # retry_add=0 避免无效重试（Cookie未更新时重试没有意义）
-        _update_task_schedule_direct(task_id, status=3, error_message=error_msg, retry_add=0)
+        # 同时上报到两个日志接口；retry_add=0 避免无效重试（Cookie未更新时重试没有意义）
+        _report_task_failure(task_id, account_name, start_date, end_date, "auth_status_check", error_msg,
+                             retry_add=0)
         return False
 
-    templates_id = platform_account.get('templates_id')
+    templates_id = platform_config.get('templates_id')
     if templates_id == 0 or templates_id is None:
         print("\n" + "=" * 60)
         print("⚠️ templates_id 未获取到，开始自动获取/创建...")
@@ -7885,6 +8315,7 @@ def _execute_single_task_inner(task_info: Dict[str, Any], browser_pool: 'Browser
 
         if templates_id:
             print(f"✅ 已成功获取 templates_id: {templates_id}")
+            remember_platform_templates_id(account_name, templates_id)
         else:
             error_msg = "无法获取或创建报表模板ID"
             print(f"⚠️ {error_msg}，将继续执行其余任务（报表相关任务将跳过）")
@@ -7938,20 +8369,23 @@ def _execute_single_task_inner(task_info: Dict[str, Any], browser_pool: 'Browser
     if len(results) == 0:
         error_msg = "所有任务未执行（登录失效或启动失败）"
         log_collect(account_name, f"任务失败 task_id={task_id}: {error_msg}", "ERROR")
-        # 上报cookie失效状态到platform_accounts
-        report_auth_invalid(account_name)
-        log_failure(account_name, 0, "all_tasks_not_executed", start_date, end_date, error_msg)
-        _update_task_schedule_direct(task_id, status=3, error_message=error_msg, retry_add=1)
+        # 同时上报cookie失效状态到platform_accounts
+        _report_task_failure(task_id, account_name, start_date, end_date, "all_tasks_not_executed", error_msg,
+                             upload_status=False, report_auth=True)
         return False
 
     print_summary(results)
 
-    # 上报任务状态
+    # 上报任务状态（与下方的任务回调互不依赖，在后台线程中并发发出，由 execute_single_task 返回前等待）
     if task == 'all':
-        upload_task_status_batch(account_name, start_date, end_date, results)
+        status_upload = (upload_task_status_batch, account_name, start_date, end_date, results)
     else:
-        if results:
-            upload_task_status_single(account_name, start_date, end_date, results[0])
+        status_upload = (upload_task_status_single, account_name, start_date, end_date, results[0])
+    status_future = _REPORT_EXECUTOR.submit(contextvars.copy_context().run, *status_upload)
+    if pending_reports is not None:
+        pending_reports.append(status_future)
+    else:
+        status_future.result()
 
     # 收集错误并上报任务回调
     task_errors = []
@@ -8024,7 +8458,8 @@ def _execute_single_task_inner(task_info: Dict[str, Any], browser_pool: 'Browser
                 cookies=_cookies,
                 mtgsig=_mtgsig
             )
-            # 上报重试结果到 data_upload_log
+            # 上报重试结果到 data_upload_log（先等后台的原始状态上报完成，避免旧的失败结果覆盖重试结果）
+            status_future.result()
             upload_task_status_single(account_name, start_date, end_date, retry_result)
 
             # 用重试结果替换原始 kewen 结果，重新评估整体状态
@@ -8178,6 +8613,8 @@ def main():
 
     _consecutive_no_task_count = 0            # 连续无任务计数
     _local_retry_queue = []                   # 本地重试队列（资源紧张时暂存任务）
+    _prefetched_tasks = deque()               # 已批量领取、尚未执行的任务
+    _busy_accounts = []                       # 因账号锁被占用而归还任务的账户（下次领取时排除）
     MAX_LOCAL_RETRIES = 3                     # 单个任务最大本地重试次数
     _last_db_retry_time = 0                   # 上次数据库失败任务重试检查时间
 
@@ -8203,21 +8640,30 @@ def main():
                     continue
 
                 # ========== Step 2: 生成任务调度 ==========
-                create_task_schedule()
-                time.sleep(5)
+                # 本地还有已领取的任务时无需再向服务器生成/领取
+                if not _prefetched_tasks:
+                    create_task_schedule()
+                    time.sleep(5)
 
                 # ========== Step 3: 获取任务 ==========
-                # 优先从本地重试队列获取任务（资源紧张时暂存的任务）
-                if _local_retry_queue:
-                    task_info = _local_retry_queue.pop(0)
+                # 优先从本地重试队列获取任务（资源紧张时暂存的任务）；
+                # 账号锁刚被占用而放回队列的任务先跳过，本轮改从服务器领取其他账户的任务
+                _local_idx = next((i for i, t in enumerate(_local_retry_queue)
+                                   if t.get('account_id') not in _busy_accounts), None)
+                if _local_idx is not None:
+                    task_info = _local_retry_queue.pop(_local_idx)
                     _retry_count = task_info.get('_local_retry_count', 0)
                     print(f"\n🔄 从本地重试队列取出任务（本地第{_retry_count}次重试）")
                     print(f"   任务ID: {task_info.get('id')}, 账户: {task_info.get('account_id')}")
-                # 队列为空时从服务器获取
-                elif browser_pool_instance and server_ip:
-                    task_info = fetch_task(server_ip=server_ip)
                 else:
-                    task_info = fetch_task()
+                    # 本地批次取完后再从服务器批量领取
+                    if not _prefetched_tasks:
+                        _prefetched_tasks.extend(fetch_tasks(
+                            server_ip=server_ip if browser_pool_instance else None,
+                            exclude_accounts=_busy_accounts,
+                        ))
+                        _busy_accounts = []
+                    task_info = _prefetched_tasks.popleft() if _prefetched_tasks else None
 
                 if not task_info:
                     _consecutive_no_task_count += 1
@@ -8236,18 +8682,18 @@ def main():
 
                     # 在等待期间执行保活（同步模式 + 资源保护）
                     if keepalive_service and browser_pool_instance:
-                        # 分段等待，每60秒检查一次
-                        remaining_wait = NO_TASK_WAIT_SECONDS
+                        # 分段等待到截止时间，每60秒检查一次（单调时钟，不受系统时间调整影响）
+                        deadline = time.monotonic() + NO_TASK_WAIT_SECONDS
                         keepalive_check_interval = 60  # 每60秒检查一次
 
-                        while remaining_wait > 0 and _daemon_running:
+                        while _daemon_running:
                             # 等待一小段时间
-                            sleep_chunk = min(keepalive_check_interval, remaining_wait)
-                            if not interruptible_sleep(sleep_chunk):
+                            now = time.monotonic()
+                            if now >= deadline:
+                                break
+                            if not interruptible_sleep(min(keepalive_check_interval, deadline - now)):
                                 break  # 收到退出信号
-                            remaining_wait -= sleep_chunk
-
-                            if not _daemon_running or remaining_wait <= 0:
+                            if time.monotonic() >= deadline:
                                 break
 
                             # ===== 资源检查与自动调节 =====
@@ -8321,21 +8767,30 @@ def main():
                             break
                         continue
 
-                total_tasks += 1
-
                 # 浏览器池模式下使用账号锁
                 if browser_pool_instance:
                     account_id = task_info.get('account_id')
-                    # 获取账号锁（阻塞等待，最多等60秒）
-                    if account_lock_manager.acquire(account_id, blocking=True, timeout=60):
-                        try:
-                            success = execute_single_task(task_info, browser_pool=browser_pool_instance)
-                        finally:
-                            account_lock_manager.release(account_id)
-                    else:
-                        print(f"⚠️ 账号 {account_id} 锁获取超时，跳过此任务")
-                        success = False
+                    # 非阻塞获取账号锁：账号正被占用（如保活中）时不原地等待，
+                    # 归还任务并继续处理其他账户的任务
+                    if not account_lock_manager.try_lock(account_id):
+                        if '_local_retry_count' in task_info:
+                            # 来自本地重试队列的任务放回队列，保留本地重试计数
+                            print(f"⚠️ 账号 {account_id} 正被占用，任务 {task_info.get('id')} 放回本地重试队列，先执行其他账户的任务")
+                            _local_retry_queue.append(task_info)
+                        else:
+                            print(f"⚠️ 账号 {account_id} 正被占用，归还任务 {task_info.get('id')}，先执行其他账户的任务")
+                            if task_info.get('id'):
+                                reset_task_schedule(task_info['id'])
+                        _busy_accounts.append(account_id)
+                        continue
+
+                    total_tasks += 1
+                    try:
+                        success = execute_single_task(task_info, browser_pool=browser_pool_instance)
+                    finally:
+                        account_lock_manager.release(account_id)
                 else:
+                    total_tasks += 1
                     success = execute_single_task(task_info)
 
                 if success:
@@ -8366,6 +8821,11 @@ def main():
                     break
 
     finally:
+        # ========== 归还已领取但未执行的任务 ==========
+        for _pending in [*_prefetched_tasks, *_local_retry_queue]:
+            if _pending.get('id'):
+                reset_task_schedule(_pending['id'])
+
         # ========== 清理浏览器池 ==========
         if browser_pool_instance:
             print("\n🛑 正在关闭浏览器池...")
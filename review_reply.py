@@ -12,11 +12,25 @@
 """
 
 import json
+import time
 import threading
 import requests
-from typing import Dict, List, Optional, Any
+from requests import PreparedRequest
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from requests.cookies import RequestsCookieJar, cookiejar_from_dict
+from urllib3.util.retry import Retry
+from typing import Dict, List, Optional, Any, Tuple, Union
 from datetime import datetime
 
+# orjson导入 (可选，加速JSON序列化；未安装时回退到标准库json)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # 统一日志模块导入
 from logger import log_review as _log_review
 
@@ -34,9 +48,47 @@ GET_PLATFORM_ACCOUNT_API = f"{API_BASE_URL}/api/get_platform_account"
 REPLY_API_URL = "https://e.dianping.com/review/app/reply/ajax/reviewreply"
 API_TIMEOUT = 30
 
+# 回复请求的固定部分（模块加载时构造一次，每次回复只补充变化的字段）
+_BASE_PARAMS = {
+    'yodaReady': 'h5',
+    'csecplatform': '4',
+    'csecversion': '4.2.0',
+}
+_BASE_HEADERS = {
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'zh-CN,zh;q=0.9',
+    'Content-Type': 'application/json',
+    'Origin': 'https://e.dianping.com',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36',
+    'sec-ch-ua': '"Not(A:Brand";v="8", "Chromium";v="144", "Google Chrome";v="144"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"',
+}
+# 平台 -> Referer / 平台编码（非 dianping 均按美团处理）
+_REFERER = {
+    'dianping': 'https://e.dianping.com/vg-platform-reviewmanage/shop-comment-dp/index.html',
+    'meituan': 'https://e.dianping.com/vg-platform-reviewmanage/shop-comment-mt/index.html',
+}
+_PLATFORM_CODE = {'dianping': 0, 'meituan': 1}
+
+# 连接池配置（按主机复用 keep-alive 连接）
+SESSION_POOL_CONNECTIONS = 4
+SESSION_POOL_MAXSIZE = 32
+
+# 单账号内并发回复的最大线程数（不超过连接池大小）
+REPLY_MAX_WORKERS = 8
+
+# 点评回复接口熔断：连续失败达到阈值后，冷却期内直接返回失败，不再请求
+DIANPING_CB_FAIL_THRESHOLD = 5
+DIANPING_CB_COOLDOWN = 60  # 秒
+
 # 线程安全的当前账号存储（每个线程独立，避免并发覆盖）
 _thread_local = threading.local()
 
+# 点评回复接口熔断状态（所有账号线程共享）
+_dianping_cb = {'fail_count': 0, 'until': 0.0}
+_dianping_cb_lock = threading.Lock()
+
 
 # ============================================================================
 # 日志函数
@@ -66,14 +118,56 @@ def log_error(message: str):
 # 工具函数
 # ============================================================================
 
-def _get_session() -> requests.Session:
-    """获取禁用代理的Session"""
+def json_dumps_bytes(obj: Any) -> bytes:
+    """序列化为UTF-8编码的JSON字节串（不转义中文），优先使用orjson"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """解析JSON（bytes或str），优先使用orjson"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _create_session(retry: Retry) -> requests.Session:
+    """创建禁用代理、带连接池和重试策略的Session
+
+    Args:
+        retry: 挂载到 HTTPAdapter 的重试策略
+
+    Returns:
+        配置好的Session
+    """
     session = requests.Session()
     session.trust_env = False
     session.proxies = {'http': None, 'https': None}
+    adapter = HTTPAdapter(pool_connections=SESSION_POOL_CONNECTIONS, pool_maxsize=SESSION_POOL_MAXSIZE,
+                          max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
     return session
 
 
+# 内部API（API_BASE_URL）共享Session
+# 查询和状态回传都可安全重放，POST 也按 5xx/连接错误重试
+_INTERNAL_SESSION = _create_session(Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=(500, 502, 503, 504),
+    allowed_methods=frozenset(['POST']),
+    raise_on_status=False,
+))
+
+# 点评回复接口共享Session；多个账号的线程共用，Cookie 只随单次请求传入，
+# 不让响应中的 Set-Cookie 留在 Session 里串到其他账号的请求上
+# 回复提交不是幂等的，只重试一次连接失败（请求未发出），避免重复回复
+_DIANPING_SESSION = _create_session(Retry(total=1, connect=1, read=False, status=0))
+_DIANPING_SESSION.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+
 # ============================================================================
 # API调用函数
 # ============================================================================
@@ -87,16 +181,15 @@ def get_pending_reply_list(account: str) -> List[Dict]:
     Returns:
         待回复评价列表
     """
-    session = _get_session()
     try:
-        response = session.post(
+        response = _INTERNAL_SESSION.post(
             PENDING_REPLY_LIST_API,
             headers={'Content-Type': 'application/json'},
-            json={"account": account},
+            data=json_dumps_bytes({"account": account}),
             timeout=API_TIMEOUT
         )
 
-        result = response.json()
+        result = json_loads(response.content)
         if result.get('success'):
             data = result.get('data')
             # 支持单条数据（对象）和多条数据（数组）两种格式
@@ -113,8 +206,6 @@ def get_pending_reply_list(account: str) -> List[Dict]:
     except Exception as e:
         log_error(f"获取待回复列表异常: {e}")
         return []
-    finally:
-        session.close()
 
 
 def get_mtgsig(account: str) -> Optional[str]:
@@ -126,16 +217,15 @@ def get_mtgsig(account: str) -> Optional[str]:
     Returns:
         mtgsig字符串，失败返回None
     """
-    session = _get_session()
     try:
-        response = session.post(
+        response = _INTERNAL_SESSION.post(
             GET_PLATFORM_ACCOUNT_API,
             headers={'Content-Type': 'application/json'},
-            json={"account": account},
+            data=json_dumps_bytes({"account": account}),
             timeout=API_TIMEOUT
         )
 
-        result = response.json()
+        result = json_loads(response.content)
         if not result.get('success'):
             return None
 
@@ -145,13 +235,11 @@ def get_mtgsig(account: str) -> Optional[str]:
         if isinstance(mtgsig_data, str):
             return mtgsig_data
         elif isinstance(mtgsig_data, dict):
-            return json.dumps(mtgsig_data)
+            return json_dumps_bytes(mtgsig_data).decode('utf-8')
         return None
     except Exception as e:
         log_warn(f"获取mtgsig异常: {e}")
         return None
-    finally:
-        session.close()
 
 
 def update_task_reply(data_name: str, review_id: str, task_reply: int, shop_reply: str) -> bool:
@@ -166,116 +254,252 @@ def update_task_reply(data_name: str, review_id: str, task_reply: int, shop_repl
     Returns:
         是否成功
     """
-    session = _get_session()
     try:
-        response = session.post(
+        response = _INTERNAL_SESSION.post(
             TASK_REPLY_UPDATE_API,
             headers={'Content-Type': 'application/json'},
-            json={
+            data=json_dumps_bytes({
                 "data_name": data_name,
-                "review_id": str(review_id),
+                "review_id": review_id,
                 "task_reply": task_reply,
                 "shop_reply": shop_reply
-            },
+            }),
             timeout=API_TIMEOUT
         )
 
-        result = response.json()
+        result = json_loads(response.content)
         return result.get('success', False)
     except Exception as e:
         log_error(f"回传结果异常: {e}")
         return False
-    finally:
-        session.close()
+
+
+def update_task_replies(updates: List[Dict]) -> bool:
+    """并发回传多条回复结果（逐条调用回传接口）
+
+    Args:
+        updates: 回传记录列表，每项包含 data_name/review_id/task_reply/shop_reply
+
+    Returns:
+        是否全部成功
+    """
+    if not updates:
+        return True
+
+    account = _get_current_account()
+
+    def _update(item: Dict) -> bool:
+        _thread_local.account = account
+        return update_task_reply(item['data_name'], item['review_id'], item['task_reply'], item['shop_reply'])
+
+    with ThreadPoolExecutor(max_workers=min(REPLY_MAX_WORKERS, len(updates)),
+                            thread_name_prefix='review-update') as executor:
+        return all(list(executor.map(_update, updates)))
 
 
 # ============================================================================
 # 回复执行函数
 # ============================================================================
 
+def _dianping_cb_open() -> bool:
+    """点评回复接口是否处于熔断冷却期"""
+    return time.monotonic() < _dianping_cb['until']
+
+
+def _dianping_cb_record(ok: bool):
+    """记录一次点评回复请求结果：成功清零计数，连续失败达到阈值则开启熔断"""
+    with _dianping_cb_lock:
+        if ok:
+            _dianping_cb['fail_count'] = 0
+            return
+        _dianping_cb['fail_count'] += 1
+        if _dianping_cb['fail_count'] >= DIANPING_CB_FAIL_THRESHOLD:
+            _dianping_cb['until'] = time.monotonic() + DIANPING_CB_COOLDOWN
+            _dianping_cb['fail_count'] = 0
+            log_warn(f"点评回复接口连续失败 {DIANPING_CB_FAIL_THRESHOLD} 次，熔断 {DIANPING_CB_COOLDOWN} 秒")
+
+
+def prepare_reply_request(
+    cookies: Union[Dict, RequestsCookieJar],
+    mtgsig: Optional[str],
+    platform: str = "dianping"
+) -> PreparedRequest:
+    """构造回复请求模板（URL、参数、请求头、Cookie 已就绪，只缺请求体）
+
+    同一账号、同一平台的多条回复共用一个模板，避免每条回复重复走 requests 的 prepare 流程
+
+    Args:
+        cookies: Cookie字典或已转换好的CookieJar
+        mtgsig: mtgsig签名
+        platform: 平台类型 (dianping/meituan)
+
+    Returns:
+        PreparedRequest 模板（使用时先 copy）
+    """
+    # URL参数（有mtgsig时追加）
+    params = {**_BASE_PARAMS, 'mtgsig': mtgsig} if mtgsig else _BASE_PARAMS
+
+    headers = {**_BASE_HEADERS, 'Referer': _REFERER.get(platform, _REFERER['meituan'])}
+
+    return _DIANPING_SESSION.prepare_request(
+        requests.Request('POST', REPLY_API_URL, params=params, headers=headers, cookies=cookies)
+    )
+
+
 def reply_review(
-    cookies: Dict,
+    cookies: Union[Dict, RequestsCookieJar],
     mtgsig: Optional[str],
     shop_id: str,
     review_id: str,
     user_id: str,
     content: str,
-    platform: str = "dianping"
+    platform: str = "dianping",
+    template: Optional[PreparedRequest] = None
 ) -> Dict[str, Any]:
     """执行评价回复
 
     Args:
-        cookies: Cookie字典
+        cookies: Cookie字典或已转换好的CookieJar
         mtgsig: mtgsig签名
         shop_id: 店铺ID
         review_id: 评价ID
         user_id: 用户ID
         content: 回复内容
         platform: 平台类型 (dianping/meituan)
+        template: prepare_reply_request 构造的请求模板（不传则按 cookies/mtgsig/platform 现场构造）
 
     Returns:
         API返回结果
     """
-    # 平台参数
-    platform_code = 0 if platform == "dianping" else 1
-    referer_page = "shop-comment-dp" if platform == "dianping" else "shop-comment-mt"
-
-    # URL参数
-    params = {
-        'yodaReady': 'h5',
-        'csecplatform': '4',
-        'csecversion': '4.2.0',
-    }
-
-    # 添加mtgsig
-    if mtgsig:
-        params['mtgsig'] = mtgsig
-
-    headers = {
-        'Accept': 'application/json, text/plain, */*',
-        'Accept-Language': 'zh-CN,zh;q=0.9',
-        'Content-Type': 'application/json',
-        'Origin': 'https://e.dianping.com',
-        'Referer': f'https://e.dianping.com/vg-platform-reviewmanage/{referer_page}/index.html',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36',
-        'sec-ch-ua': '"Not(A:Brand";v="8", "Chromium";v="144", "Google Chrome";v="144"',
-        'sec-ch-ua-mobile': '?0',
-        'sec-ch-ua-platform': '"Windows"',
-    }
+    # 熔断期间不发请求；skipped 标记表示回复未发出，调用方不应回传失败
+    if _dianping_cb_open():
+        return {"code": -1, "msg": "点评回复接口连续失败，熔断中", "skipped": True}
 
     # 请求体
     body = {
         "clientType": 1,
-        "platform": platform_code,
+        "platform": _PLATFORM_CODE.get(platform, 1),
         "content": content,
         "replyId": 0,
-        "shopIdStr": str(shop_id),
-        "reviewId": str(review_id),
-        "userId": str(user_id)
+        "shopIdStr": shop_id,
+        "reviewId": review_id,
+        "userId": user_id
     }
 
-    session = _get_session()
     try:
-        response = session.post(
-            REPLY_API_URL,
-            params=params,
-            headers=headers,
-            cookies=cookies,
-            json=body,
-            timeout=API_TIMEOUT
-        )
+        if template is None:
+            template = prepare_reply_request(cookies, mtgsig, platform)
+        request = template.copy()
+        request.body = json_dumps_bytes(body)
+        request.headers['Content-Length'] = str(len(request.body))
+        response = _DIANPING_SESSION.send(request, timeout=API_TIMEOUT)
+    except Exception as e:
+        _dianping_cb_record(False)
+        return {"code": -1, "msg": str(e)}
 
-        return response.json()
+    _dianping_cb_record(response.status_code < 500)
+    try:
+        return json_loads(response.content)
     except Exception as e:
         return {"code": -1, "msg": str(e)}
-    finally:
-        session.close()
 
 
 # ============================================================================
 # 主处理函数
 # ============================================================================
 
+def _get_mtgsig_for(account: str) -> Optional[str]:
+    """在工作线程中获取mtgsig（带上账号日志标签）"""
+    _thread_local.account = account
+    return get_mtgsig(account)
+
+
+def _reply_update(platform: str, review_id: str, task_reply: int, shop_reply: str) -> Dict:
+    """构造一条回传记录"""
+    return {
+        "data_name": platform,
+        "review_id": review_id,
+        "task_reply": task_reply,
+        "shop_reply": shop_reply
+    }
+
+
+def _parse_task(task: Dict) -> Optional[Tuple[str, str, str, str, str]]:
+    """提取并校验待回复任务的字段
+
+    Args:
+        task: 待回复任务
+
+    Returns:
+        (review_id, shop_id, user_id, content, platform)；缺少必要字段时返回None
+    """
+    review_id = str(task.get('review_id', ''))
+    shop_id = str(task.get('shop_id', ''))
+    content = task.get('ai_gen', '')
+
+    # 检查必要字段
+    if not review_id or not shop_id or not content:
+        log_warn(f"跳过无效任务: review_id={review_id}, shop_id={shop_id}")
+        return None
+
+    return review_id, shop_id, str(task.get('user_id', '0')), content, task.get('platform', 'dianping')
+
+
+def _handle_one(account: str, fields: Tuple[str, str, str, str, str],
+                cookies: RequestsCookieJar, mtgsig: Optional[str],
+                templates: Dict[str, PreparedRequest]) -> Tuple[str, Optional[Dict]]:
+    """处理单条已校验的待回复评价（在线程池中执行）
+
+    Args:
+        account: 账户名（用于工作线程的日志账号标签）
+        fields: _parse_task 返回的任务字段
+        cookies: 由保活cookie转换的CookieJar
+        mtgsig: mtgsig签名
+        templates: 平台 -> 回复请求模板
+
+    Returns:
+        (处理结果 "success"/"failed"/"skipped", 待回传的失败记录；成功已即时回传、熔断跳过时为None)
+    """
+    _thread_local.account = account
+    review_id, shop_id, user_id, content, platform = fields
+
+    try:
+        # 执行回复
+        result = reply_review(
+            cookies=cookies,
+            mtgsig=mtgsig,
+            shop_id=shop_id,
+            review_id=review_id,
+            user_id=user_id,
+            content=content,
+            platform=platform,
+            template=templates.get(platform)
+        )
+
+        # 熔断跳过：回复未发出，不回传，评价保持待回复，下一轮再处理
+        if result.get('skipped'):
+            log_warn(f"评价 {review_id} 因点评接口熔断跳过，留待下次回复")
+            return "skipped", None
+
+        # 判断结果
+        if result.get('code') == 200 or result.get('success'):
+            # 回复成功：立即回传。回复已公开发出，若等整轮结束再回传，中途退出会导致下一轮重复回复
+            log_info(f"评价 {review_id} 回复成功")
+            update_task_reply(platform, review_id, 2, content)
+            return "success", None
+
+        # 回复失败
+        error_msg = result.get('msg', str(result))
+        if isinstance(error_msg, dict):
+            error_msg = json.dumps(error_msg, ensure_ascii=False)
+        log_warn(f"评价 {review_id} 回复失败: {error_msg}")
+        return "failed", _reply_update(platform, review_id, 3, str(error_msg)[:500])
+
+    except Exception as e:
+        log_error(f"评价 {review_id} 回复异常: {e}")
+        return "failed", _reply_update(platform, review_id, 3, str(e)[:500])
+
+
 def process_review_replies(account: str, cookies: Dict) -> Dict[str, int]:
     """处理账户的待回复评价
 
@@ -286,15 +510,19 @@ def process_review_replies(account: str, cookies: Dict) -> Dict[str, int]:
         cookies: 保活获取的cookie字典
 
     Returns:
-        处理统计 {"total": 总数, "success": 成功数, "failed": 失败数}
+        处理统计 {"total": 总数, "success": 成功数, "failed": 失败数, "skipped": 熔断跳过数}
     """
     _thread_local.account = account
 
-    stats = {"total": 0, "success": 0, "failed": 0}
+    stats = {"total": 0, "success": 0, "failed": 0, "skipped": 0}
 
     try:
-        # 1. 获取待回复列表
-        pending_list = get_pending_reply_list(account)
+        # 1+2. 待回复列表和mtgsig互不依赖，同时请求
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='review-mtgsig') as executor:
+            mtgsig_future = executor.submit(_get_mtgsig_for, account)
+            pending_list = get_pending_reply_list(account)
+            mtgsig = mtgsig_future.result()
+
         if not pending_list:
             log_info(f"{account} 无待回复评价")
             return stats
@@ -302,59 +530,45 @@ def process_review_replies(account: str, cookies: Dict) -> Dict[str, int]:
         stats["total"] = len(pending_list)
         log_info(f"{account} 有 {len(pending_list)} 条待回复评价")
 
-        # 2. 获取mtgsig
-        mtgsig = get_mtgsig(account)
-        if not mtgsig:
-            log_warn(f"{account} 未获取到mtgsig，回复可能失败")
-
-        # 3. 遍历执行回复
+        # 3. 先校验任务字段，无效任务直接计为失败，不占用回复线程
+        valid_tasks = []
         for task in pending_list:
-            review_id = str(task.get('review_id', ''))
-            shop_id = str(task.get('shop_id', ''))
-            user_id = str(task.get('user_id', '0'))
-            content = task.get('ai_gen', '')
-            platform = task.get('platform', 'dianping')
-
-            # 检查必要字段
-            if not review_id or not shop_id or not content:
-                log_warn(f"跳过无效任务: review_id={review_id}, shop_id={shop_id}")
-                stats["failed"] += 1
-                continue
-
-            try:
-                # 执行回复
-                result = reply_review(
-                    cookies=cookies,
-                    mtgsig=mtgsig,
-                    shop_id=shop_id,
-                    review_id=review_id,
-                    user_id=user_id,
-                    content=content,
-                    platform=platform
-                )
-
-                # 判断结果
-                if result.get('code') == 200 or result.get('success'):
-                    # 回复成功
-                    log_info(f"评价 {review_id} 回复成功")
-                    update_task_reply(platform, review_id, 2, content)
-                    stats["success"] += 1
-                else:
-                    # 回复失败
-                    error_msg = result.get('msg', str(result))
-                    if isinstance(error_msg, dict):
-                        error_msg = json.dumps(error_msg, ensure_ascii=False)
-                    log_warn(f"评价 {review_id} 回复失败: {error_msg}")
-                    update_task_reply(platform, review_id, 3, str(error_msg)[:500])
-                    stats["failed"] += 1
-
-            except Exception as e:
-                log_error(f"评价 {review_id} 回复异常: {e}")
-                update_task_reply(platform, review_id, 3, str(e)[:500])
+            fields = _parse_task(task)
+            if fields:
+                valid_tasks.append(fields)
+            else:
                 stats["failed"] += 1
 
-        # 4. 输出统计
-        log_info(f"{account} 评价回复完成: 总计 {stats['total']}, 成功 {stats['success']}, 失败 {stats['failed']}")
+        if not valid_tasks:
+            log_warn(f"{account} {stats['total']} 条待回复评价均无效，未执行回复")
+            return stats
+
+        if not mtgsig:
+            log_warn(f"{account} 未获取到mtgsig，回复可能失败")
+
+        # 4. 并发执行回复（各条评价之间无依赖，网络等待可重叠）
+        # cookie 只转换一次；仍随每次请求传入，不挂到多账号共享的Session上
+        cookie_jar = cookiejar_from_dict(cookies)
+        # 按平台预先构造请求模板，各条回复只替换请求体
+        templates = {
+            platform: prepare_reply_request(cookie_jar, mtgsig, platform)
+            for platform in {fields[4] for fields in valid_tasks}
+        }
+        max_workers = min(REPLY_MAX_WORKERS, len(valid_tasks))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='review-reply') as executor:
+            futures = [executor.submit(_handle_one, account, fields, cookie_jar, mtgsig, templates) for fields in valid_tasks]
+            updates = []
+            for future in as_completed(futures):
+                status, update = future.result()
+                stats[status] += 1
+                if update:
+                    updates.append(update)
+
+        # 5. 回传失败结果（成功结果已在回复后即时回传）
+        update_task_replies(updates)
+
+        # 6. 输出统计
+        log_info(f"{account} 评价回复完成: 总计 {stats['total']}, 成功 {stats['success']}, 失败 {stats['failed']}, 熔断跳过 {stats['skipped']}")
 
     except Exception as e:
         log_error(f"{account} 处理评价回复异常: {e}")